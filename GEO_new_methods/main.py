@@ -8,11 +8,12 @@ from connector.chatgpt import ChatGPTConnector
 
 if __name__ == "__main__":
 
-    connector = ChatGPTConnector("chatgpt-4o-latest")
     method = 'addELI5' 
     df = pd.read_csv("GEO_new_methods/data/processed_test.csv")
 
 
+    # Only needed by run_pipeline / run_method, summarizing existing results needs no API key
+    # connector = ChatGPTConnector("chatgpt-4o-latest")
     # df = run_pipeline(
     #     original_df = df,
     #     connector = connector,
@@ -1,9 +1,9 @@
-import pandas as pd
 import ast
-import tiktoken
+from instrumentation.profiling import profiled
 
 
 def clean_dataset(df):
+    import tiktoken
 
     df['cleaned_sources'] = df['sources'].apply(lambda sources: parse_string_to_list(sources, column_name='cleaned_text'))
     df['url'] = df['sources'].apply(lambda sources: parse_string_to_list(sources, column_name='url'))
@@ -11,6 +11,7 @@ def clean_dataset(df):
 
     return df
 
+@profiled()
 def parse_dataset(df):
 
     list_columns = ['cleaned_sources', 'url', 'num_tokens_sources', 'evaluation_results']
@@ -1,7 +1,22 @@
+import re
 from typing import Optional, Tuple
 
+from connector.responses import response_text
 
-def edit_document(method: str, document: str, connector, query: Optional[str] = None) -> str:
+# The fenced "Source" block of the method prompt templates
+_SOURCE_BLOCK = re.compile(r"(Source\s*:\s*\n)?```\s*\n(Source\s*:\s*\n)?\{source\}\s*\n```")
+
+
+def _prefix_prompt(prompt_template: str, document: str, query: Optional[str]) -> str:
+    """
+    Document first, method instructions last. All methods editing the same document then send
+    the same prompt prefix, which the provider can serve from its prompt cache.
+    """
+    instructions = _SOURCE_BLOCK.sub("(the source above)", prompt_template)
+    return f"Source:\n```\n{document}\n```\n\n" + instructions.format(source="(the source above)", query=query).strip()
+
+
+def edit_document(method: str, document: str, connector, query: Optional[str] = None, layout: str = 'default') -> str:
     """
     Edits a document according to instructions from a method-specific prompt file.
 
@@ -10,6 +25,8 @@ def edit_document(method: str, document: str, connector, query: Optional[str] =
         document (str): The original document text to be edited.
         connector: Connector instance (e.g., ChatGPTConnector) with a call method.
         query (Optional[str]): Optional additional instructions for the editing process.
+        layout (str): 'default' fills the document into the prompt template, 'prefix' puts it
+            before the instructions (see `search.PROMPT_LAYOUTS`).
 
     Returns:
         str: The edited document.
@@ -35,7 +52,10 @@ def edit_document(method: str, document: str, connector, query: Optional[str] =
         return "Error: Prompt file is empty."
 
     # Prepare user prompt by replacing {source} and {query}
-    user_prompt = prompt_template.format(source=document, query=query).strip()
+    if layout == 'prefix':
+        user_prompt = _prefix_prompt(prompt_template, document, query)
+    else:
+        user_prompt = prompt_template.format(source=document, query=query).strip()
 
 
     # Set system prompt to expert editor
@@ -43,7 +63,7 @@ def edit_document(method: str, document: str, connector, query: Optional[str] =
 
     # Call the connector to perform the editing
     try:
-        edited_document = connector.call(system_prompt, user_prompt, temp=0, top_p=1)
-        return edited_document
+        response = connector.call(system_prompt, user_prompt, temp=0, top_p=1)
+        return response_text(response)
     except Exception as e:
         return f"Error during editing: {str(e)}"
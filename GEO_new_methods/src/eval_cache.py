@@ -0,0 +1,125 @@
+"""
+Persistent cache of evaluation results.
+
+`evaluate(response, sources)` is looked up by (evaluator version, response hash, ordered
+sources hash) before LexRank runs. The evaluator version hashes the scoring source files and
+parameters, so editing the evaluator or changing a parameter starts a fresh set of entries
+instead of returning stale scores.
+
+The cache is a SQLite file, by default ~/.cache/geo/evaluations.sqlite. Set GEO_EVAL_CACHE to
+another path, or to 'off' to disable it; `configure_eval_cache` does the same from code.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from instrumentation.metrics import get_recorder
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'geo', 'evaluations.sqlite')
+_DISABLED = {'', '0', 'off', 'false', 'none'}
+
+
+def content_hash(value) -> str:
+    """Hash of a text, or of an ordered list of texts."""
+    if not isinstance(value, str):
+        value = json.dumps(list(value), ensure_ascii=False)
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def code_version(paths: Sequence[str], params: dict) -> str:
+    """Hash of the contents of `paths` and the JSON of `params`."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class EvaluationCache:
+    """SQLite store of evaluation results, safe to share between threads and processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS evaluations ('
+                'version TEXT, response_hash TEXT, sources_hash TEXT, result TEXT, '
+                'PRIMARY KEY (version, response_hash, sources_hash))'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, version: str, response: str, sources: List[str]) -> Optional[List[Tuple[float, float]]]:
+        key = (version, content_hash(response), content_hash(sources))
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT result FROM evaluations WHERE version = ? AND response_hash = ? AND sources_hash = ?', key
+            ).fetchone()
+        if row is None:
+            get_recorder().increment('eval_cache_misses')
+            return None
+        get_recorder().increment('eval_cache_hits')
+        return [tuple(scores) for scores in json.loads(row[0])]
+
+    def put(self, version: str, response: str, sources: List[str], result: List[Tuple[float, float]]):
+        key = (version, content_hash(response), content_hash(sources))
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?)', key + (json.dumps(result),))
+            conn.commit()
+
+    def clear(self, version: Optional[str] = None):
+        """Removes all entries, or only those of `version`."""
+        with self._lock:
+            conn = self._connect()
+            if version is None:
+                conn.execute('DELETE FROM evaluations')
+            else:
+                conn.execute('DELETE FROM evaluations WHERE version = ?', (version,))
+            conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM evaluations').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[EvaluationCache] = None
+
+
+def configure_eval_cache(path: Optional[str] = None) -> Optional[EvaluationCache]:
+    """
+    Sets the cache used by `evaluate`. The path defaults to GEO_EVAL_CACHE, then DEFAULT_PATH;
+    'off' disables caching.
+    """
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    path = path if path is not None else os.environ.get('GEO_EVAL_CACHE', DEFAULT_PATH)
+    _cache = None if path.strip().lower() in _DISABLED else EvaluationCache(path)
+    return _cache
+
+
+def get_eval_cache() -> Optional[EvaluationCache]:
+    return _cache
+
+
+configure_eval_cache()
@@ -1,14 +1,35 @@
-import re
 from typing import List, Sequence, Mapping, Tuple, Iterable
-from collections import defaultdict
-from lexrank import LexRank
-from lexrank.mappings import STOPWORDS
-from nltk.tokenize import sent_tokenize
+from functools import lru_cache
+
+import numpy as np
+
+from GEO_new_methods.src import analyzer
+from GEO_new_methods.src.analyzer import CITATION, ResponseAnalysis, compute_metrics
+from GEO_new_methods.src.eval_cache import code_version, get_eval_cache
+
+# Scoring parameters, part of the evaluator version of cached results
+LEXRANK_PARAMS = {'threshold': 0.1, 'fast_power_method': False, 'stopwords': 'en'}
+
+# Files whose contents define the scores, editing one invalidates the evaluation cache
+VERSION_FILES = [__file__, analyzer.__file__]
+
+
+@lru_cache(maxsize=None)
+def evaluator_version() -> str:
+    """Hash of the scoring code, parameters and LexRank version."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        lexrank_version = version('lexrank')
+    except PackageNotFoundError:
+        lexrank_version = None
+    return code_version(VERSION_FILES, {**LEXRANK_PARAMS, 'lexrank': lexrank_version})
 
 
 def evaluate(response: str, sources: List[str]) -> List[Tuple[float, float]]:
     """
     Evaluates response against sources, returning importance and position-weighted word count scores.
+    Results are cached by response and sources content (see eval_cache.py).
     
     Args:
         response (str): The response text with citations.
@@ -17,11 +38,100 @@ def evaluate(response: str, sources: List[str]) -> List[Tuple[float, float]]:
     Returns:
         List[Tuple[float, float]]: List of (importance, position_weighted_word_count) scores.
     """
+    cache = get_eval_cache()
+    if cache is None or not isinstance(response, str):
+        return _evaluate(response, sources)
+
+    version = evaluator_version()
+    result = cache.get(version, response, sources)
+    if result is None:
+        result = _evaluate(response, sources)
+        cache.put(version, response, sources, result)
+    return result
+
+
+def evaluate_samples(responses: List[str], sources: List[str]) -> List[List[Tuple[float, float]]]:
+    """
+    Evaluates several sampled responses to the same sources. The LexRank model of the sources is
+    built once and shared by all samples that are not cached yet.
+
+    Returns:
+        List[List[Tuple[float, float]]]: The `evaluate` scores of every response, in order.
+    """
+    cache = get_eval_cache()
+    version = evaluator_version() if cache is not None else None
+    results = [cache.get(version, r, sources) if cache is not None and isinstance(r, str) else None for r in responses]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        lxr = _lexrank(sources)
+        for i in missing:
+            results[i] = _score(lxr, responses[i], len(sources))
+            if cache is not None and isinstance(responses[i], str):
+                cache.put(version, responses[i], sources, results[i])
+    return results
+
+
+def _sample_array(samples) -> np.ndarray | None:
+    """
+    Samples as a (samples, sources, 2) array, None if there are none. Samples with another
+    number of sources than the most common one (malformed results) are left out.
+    """
+    samples = [sample for sample in samples or [] if isinstance(sample, (list, tuple)) and len(sample)]
+    if not samples:
+        return None
+    lengths = [len(sample) for sample in samples]
+    length = max(set(lengths), key=lengths.count)
+    values = np.asarray([sample for sample in samples if len(sample) == length], dtype=float)
+    return values if values.ndim == 3 else None
+
+
+def mean_scores(samples: List[List[Tuple[float, float]]]) -> List[Tuple[float, float]]:
+    """Per source mean of the (importance, position_weighted_word_count) scores of several samples, [] for none."""
+    values = _sample_array(samples)
+    if values is None:
+        return []
+    return [tuple(scores) for scores in values.mean(axis=0).tolist()]
+
+
+def sample_stderr(samples: List[List[Tuple[float, float]]]) -> List[Tuple[float, float]]:
+    """Per source standard error of the mean of (importance, word count) pairs over samples, 0 for a single sample."""
+    values = _sample_array(samples)
+    if values is None:
+        return []
+    if len(values) < 2:
+        return [(0.0, 0.0)] * values.shape[1]
+    # Percentage changes from a zero score are inf, their spread is undefined (nan)
+    with np.errstate(invalid='ignore'):
+        stderr = values.std(axis=0, ddof=1) / np.sqrt(len(values))
+    return [tuple(se) for se in stderr.tolist()]
+
+
+def combined_stderr(old_stderr, new_stderr) -> List[Tuple[float, float]]:
+    """Standard error of the difference of two independent means."""
+    old = np.asarray(old_stderr, dtype=float) if len(old_stderr) else 0.0
+    combined = np.sqrt(np.square(old) + np.square(np.asarray(new_stderr, dtype=float)))
+    return [tuple(se) for se in combined.tolist()]
+
+
+def _evaluate(response: str, sources: List[str]) -> List[Tuple[float, float]]:
+    return _score(_lexrank(sources), response, len(sources))
+
+
+def _lexrank(sources: List[str]):
+    # Imported here, lexrank and nltk pull in scipy and take most of the package import time
+    from lexrank import LexRank
+    from lexrank.mappings import STOPWORDS
+    from nltk.tokenize import sent_tokenize
+
     documents = [sent_tokenize(doc) for doc in sources]
+    return LexRank(documents, stopwords=STOPWORDS[LEXRANK_PARAMS['stopwords']])
+
+
+def _score(lxr, response: str, num_sources: int) -> List[Tuple[float, float]]:
+    from nltk.tokenize import sent_tokenize
+
     response_sentences = sent_tokenize(response)
-    
-    lxr = LexRank(documents, stopwords=STOPWORDS['en'])
-    lexrank_scores = lxr.rank_sentences(response_sentences, threshold=0.1, fast_power_method=False)
+    lexrank_scores = lxr.rank_sentences(response_sentences, threshold=LEXRANK_PARAMS['threshold'], fast_power_method=LEXRANK_PARAMS['fast_power_method'])
     
     importance_scores, position_weighted_wc = analyze_response(response_sentences, lexrank_scores)
     
@@ -36,7 +146,7 @@ def evaluate(response: str, sources: List[str]) -> List[Tuple[float, float]]:
     
     # Return scores for each source
     result = []
-    for i in range(len(sources)):
+    for i in range(num_sources):
         source_index = i + 1  # 1-indexed
         imp_score = importance_scores.get(source_index, 0.0)
         pos_wc_score = pos_wc_normalized.get(source_index, 0.0)
@@ -59,8 +169,7 @@ def evaluate_diff(old_scores, new_scores):
 
 def _extract_citations(sentence: str) -> Tuple[int, ...]:
     """Extract citation numbers from sentence."""
-    pattern = re.compile(r"\[(?P<num>\d+)\]")
-    numbers = {int(m.group('num')) for m in pattern.finditer(sentence)}
+    numbers = {int(n) for n in CITATION.findall(sentence)}
     return tuple(sorted(numbers))
 
 
@@ -68,48 +177,19 @@ def compute_normalized_importance(sentences: Sequence[str], scores: Sequence[flo
     """Compute normalized importance per source based on LexRank scores."""
     if len(sentences) != len(scores):
         raise ValueError("Sentences and scores must have the same length.")
-
-    raw_scores = defaultdict(float)
-    total_weight = 0.0
-
-    for sentence, score in zip(sentences, scores):
-        citations = _extract_citations(sentence)
-        if not citations:
-            continue
-        for src in citations:
-            raw_scores[src] += float(score)
-        total_weight += float(score) * len(citations)
-
-    if total_weight <= 0.0:
-        return {}
-
-    return {src: weight / total_weight for src, weight in raw_scores.items()}
+    return compute_metrics(ResponseAnalysis.from_sentences(sentences), scores, ['importance'])['importance']
 
 
 def compute_position_weighted_word_count(sentences: Sequence[str]) -> Mapping[int, float]:
     """Compute position-weighted word count: word_count / sentence_position."""
-    citation_pattern = re.compile(r'\[\d+\]')
-    weighted_word_counts = defaultdict(float)
-
-    for idx, sentence in enumerate(sentences, start=1):
-        citations = _extract_citations(sentence)
-        if not citations:
-            continue
-            
-        # Remove citations and count words
-        cleaned_sentence = citation_pattern.sub('', sentence).strip()
-        word_count = len(cleaned_sentence.split())
-        weight = word_count / idx
-        
-        for src in citations:
-            weighted_word_counts[src] += weight
-
-    return dict(weighted_word_counts)
+    analysis = ResponseAnalysis.from_sentences(sentences)
+    return compute_metrics(analysis, np.zeros(len(sentences)), ['position_weighted_word_count'])['position_weighted_word_count']
 
 
 def analyze_response(sentences: Sequence[str], lexrank_scores: Iterable[float]) -> Tuple[Mapping[int, float], Mapping[int, float]]:
-    """Compute importance and position-weighted word count metrics."""
+    """Compute importance and position-weighted word count metrics from a single parse of the sentences."""
     scores_list = list(lexrank_scores)
-    importance = compute_normalized_importance(sentences, scores_list)
-    position_weighted_wc = compute_position_weighted_word_count(sentences)
-    return importance, position_weighted_wc
+    if len(sentences) != len(scores_list):
+        raise ValueError("Sentences and scores must have the same length.")
+    metrics = compute_metrics(ResponseAnalysis.from_sentences(sentences), scores_list, ['importance', 'position_weighted_word_count'])
+    return metrics['importance'], metrics['position_weighted_word_count']
@@ -2,9 +2,10 @@ from typing import Sequence, Tuple, List
 import pandas as pd
 import numpy as np
 from typing import Union, Sequence, List
-from tqdm.auto import tqdm
 import math
 
+from GEO_new_methods.src.evaluator import combined_stderr, mean_scores, sample_stderr
+
 Score = Tuple[float, float]
 ScoreList = Sequence[Score]
 
@@ -50,6 +51,8 @@ def batch_evaluate_diff(
     - If df_or_dfs is a sequence of DataFrames (batches):
         - If concat=True, returns a single concatenated DataFrame with a `batch_id` column.
         - If concat=False, returns a list of processed DataFrames (one per batch).
+    - If the results were sampled (`{new_results_col}_samples`, and optionally `{old_results_col}_samples`),
+      the standard error of every change is stored in `{output_col}_stderr`.
     """
 
     def _process_one(dfx: pd.DataFrame) -> pd.DataFrame:
@@ -59,6 +62,7 @@ def batch_evaluate_diff(
             raise KeyError(f"Missing columns: {missing}")
         out = dfx.copy()
         if show_progress:
+            from tqdm.auto import tqdm
             tqdm.pandas(desc="Computing evaluation differences")
             apply = out.progress_apply
         else:
@@ -68,8 +72,20 @@ def batch_evaluate_diff(
             return evaluate_diff(row[old_results_col], row[new_results_col], strict=strict)
 
         out[output_col] = apply(_row_diff, axis=1)  # type: ignore
+        if f'{new_results_col}_samples' in out.columns:
+            out[f'{output_col}_stderr'] = out.apply(_row_stderr, axis=1)
         return out
 
+    def _row_stderr(row):
+        # Spread of the change over the samples of each side, against the mean of the other side
+        old_samples = row[f'{old_results_col}_samples'] if f'{old_results_col}_samples' in row else None
+        old_samples = old_samples if isinstance(old_samples, list) else None
+        new_samples = row[f'{new_results_col}_samples']
+        old = mean_scores(old_samples) if old_samples else row[old_results_col]
+        new_se = sample_stderr([evaluate_diff(old, sample, strict=strict) for sample in new_samples])
+        old_se = sample_stderr([evaluate_diff(sample, mean_scores(new_samples), strict=strict) for sample in old_samples]) if old_samples else []
+        return combined_stderr(old_se, new_se)
+
     # Single DataFrame case
     if isinstance(df_or_dfs, pd.DataFrame):
         return _process_one(df_or_dfs)
@@ -80,6 +96,7 @@ def batch_evaluate_diff(
 
     iterator = range(len(dfs))
     if show_progress:
+        from tqdm.auto import tqdm
         iterator = tqdm(iterator, desc="Processing batches")
 
     for i in iterator:
@@ -103,7 +120,9 @@ def summarize_differences(
 ) -> pd.Series:
     """
     Aggregate per-row chosen document deltas into summary metrics.
-    Returns a pandas Series with means, medians, stds, and positive rates.
+    Returns a pandas Series with means, medians, stds, standard errors of the means, and positive rates.
+    With a `{diff_col}_stderr` column (sampled searches), also the part of the standard error
+    that comes from sampling the responses.
     All values rounded to 2 decimals.
     """
     if abs(weight_imp + weight_wc - 1.0) > 1e-9:
@@ -113,6 +132,9 @@ def summarize_differences(
     imp_deltas: List[float] = []
     wc_deltas: List[float] = []
     totals: List[float] = []
+    imp_se: List[float] = []
+    wc_se: List[float] = []
+    stderr_col = f'{diff_col}_stderr'
 
     for _, row in df.iterrows():
         diffs = row.get(diff_col)
@@ -123,6 +145,10 @@ def summarize_differences(
         imp_deltas.append(float(imp_delta))
         wc_deltas.append(float(wc_delta))
         totals.append(weight_imp * float(imp_delta) + weight_wc * float(wc_delta))
+        stderrs = row.get(stderr_col)
+        if isinstance(stderrs, (list, tuple)) and idx < len(stderrs):
+            imp_se.append(float(stderrs[idx][0]))
+            wc_se.append(float(stderrs[idx][1]))
 
     if not imp_deltas:
         raise ValueError("No valid differences found to summarize.")
@@ -131,7 +157,7 @@ def summarize_differences(
     wc = np.array(wc_deltas, dtype=float)
     tot = np.array(totals, dtype=float)
 
-    return pd.Series(
+    summary = pd.Series(
         {
             "n": len(imp),
             "mean_importance": round(float(np.mean(imp)), 2),
@@ -141,6 +167,8 @@ def summarize_differences(
             "median_word_count": round(float(np.median(wc)), 2),
             "std_importance": round(float(np.std(imp, ddof=1)), 2) if len(imp) > 1 else 0.0,
             "std_word_count": round(float(np.std(wc, ddof=1)), 2) if len(wc) > 1 else 0.0,
+            "se_importance": round(float(np.std(imp, ddof=1) / np.sqrt(len(imp))), 2) if len(imp) > 1 else 0.0,
+            "se_word_count": round(float(np.std(wc, ddof=1) / np.sqrt(len(wc))), 2) if len(wc) > 1 else 0.0,
             "positive_rate_importance": round(float(np.mean(imp > 0)), 2),
             "positive_rate_word_count": round(float(np.mean(wc > 0)), 2),
             "positive_rate_total": round(float(np.mean(tot > 0)), 2),
@@ -148,6 +176,11 @@ def summarize_differences(
             "weight_word_count": round(weight_wc, 2),
         }
     )
+    if len(imp_se) == len(imp):
+        # Standard error of the mean change due to response sampling alone
+        summary["sampling_se_importance"] = round(float(np.sqrt(np.sum(np.square(imp_se)))) / len(imp), 2)
+        summary["sampling_se_word_count"] = round(float(np.sqrt(np.sum(np.square(wc_se)))) / len(wc), 2)
+    return summary
 
 def print_diff_summary(summary, method_name="Method", width=72):
     """
@@ -188,6 +221,8 @@ def print_diff_summary(summary, method_name="Method", width=72):
     median_wc = g("median_word_count")
     std_imp = g("std_importance")
     std_wc = g("std_word_count")
+    se_imp = g("se_importance")
+    se_wc = g("se_word_count")
 
     # Print
     print(sep)
@@ -198,5 +233,8 @@ def print_diff_summary(summary, method_name="Method", width=72):
     print(f"{'mean':<{label_w}} importance={mean_imp:.2f}, word_count={mean_wc:.2f}, total={mean_total:.2f}")
     print(f"{'median':<{label_w}} importance={median_imp:.2f}, word_count={median_wc:.2f}")
     print(f"{'std':<{label_w}} importance={std_imp:.2f}, word_count={std_wc:.2f}")
+    print(f"{'std error':<{label_w}} importance={se_imp:.2f}, word_count={se_wc:.2f}")
+    if "sampling_se_importance" in summary:
+        print(f"{'sampling s.e.':<{label_w}} importance={g('sampling_se_importance'):.2f}, word_count={g('sampling_se_word_count'):.2f}")
     print(f"{'overall sentiment':<{label_w}} overall positive:{pos}, overall negative:{neg}")
     print(sep)
@@ -1,49 +1,145 @@
+import os
 import pandas as pd
 from GEO_new_methods.src.chooser import choose_document
 from GEO_new_methods.src.database import parse_dataset,create_batches
 from GEO_new_methods.src.editor import edit_document
-from GEO_new_methods.src.search import perform_search
+from GEO_new_methods.src.search import perform_search, perform_search_async, perform_search_samples, perform_search_stream
+from GEO_new_methods.src.sharding import select_shard, shard_path
+from GEO_new_methods.src.textpool import intern_frame, resolve, resolve_many
 from GEO_new_methods.src.utils import save_object
-from GEO_new_methods.src.evaluator import evaluate, evaluate_diff
-import tqdm
+from GEO_new_methods.src.evaluator import combined_stderr, evaluate, evaluate_diff, evaluate_samples, mean_scores, sample_stderr
+from connector.transport import gather_limited, run_async
+from instrumentation.metrics import get_recorder, print_metrics_summary
+from instrumentation.profiling import print_profile_summary, profiled
 
 
-def batch_search_vectorized(df, connector, query_col='query', sources_col='cleaned_sources', response_col='response') -> pd.DataFrame:
+def _store(text, pool):
+    """Pool id of `text` when a text pool is used, else the text."""
+    return pool.intern(text) if pool is not None and isinstance(text, str) else text
+
+def _concat(batches, df):
+    """The processed batches as one frame, or an empty frame with the columns of `df` if there are none (e.g. an empty shard)."""
+    return pd.concat(batches, ignore_index=True) if batches else df.iloc[0:0].copy()
+
+def _has_samples(df, col):
+    """True if every row of `df` holds a list of samples in `col`."""
+    return col in df.columns and bool(df[col].map(lambda samples: isinstance(samples, list)).all())
+
+@profiled()
+def batch_search_vectorized(df, connector, query_col='query', sources_col='cleaned_sources', response_col='response', stream=False, stop_condition=None, pool=None, samples=1, sample_temp=1.0, layout='default', volatile_col=None, usage=False) -> pd.DataFrame:
+    # With a text pool, sources are read and responses stored as pool ids (see textpool.py)
+    # With the 'prefix' layout, the source indexed by `volatile_col` (e.g. the edited one) is placed last
+    def prompt_args(row):
+        volatile_idx = row[volatile_col] if volatile_col is not None else None
+        return dict(layout=layout, volatile_idx=volatile_idx)
+
     def search_row(row):
-        return perform_search(row[query_col], row[sources_col], connector)
+        return _store(perform_search(row[query_col], resolve_many(row[sources_col], pool), connector, **prompt_args(row)), pool)
+
+    def usage_row(row):
+        text, call_usage = perform_search(row[query_col], resolve_many(row[sources_col], pool), connector, return_usage=True, **prompt_args(row))
+        return pd.Series([_store(text, pool), call_usage.get('prompt_tokens'), call_usage.get('cached_tokens')])
+
+    def sample_row(row):
+        result, call_usage = perform_search_samples(row[query_col], resolve_many(row[sources_col], pool), connector, n=samples, temp=sample_temp,
+                                                    return_usage=True, **prompt_args(row))
+        texts = [_store(text, pool) for text in ([result] if isinstance(result, str) else result)]
+        return pd.Series([texts, call_usage.get('prompt_tokens'), call_usage.get('cached_tokens')])
+
+    def stream_row(row):
+        result = perform_search_stream(row[query_col], resolve_many(row[sources_col], pool), connector, stop_condition=stop_condition, **prompt_args(row))
+        if isinstance(result, str):
+            return pd.Series([_store(result, pool), None, None, False])
+        return pd.Series([_store(result.text, pool), result.time_to_first_token, result.total_time, result.stopped_early])
+
+    if samples > 1 and (stream or stop_condition is not None):
+        raise ValueError("Sampled searches (samples > 1) cannot be streamed")
+    if usage and (stream or stop_condition is not None):
+        raise ValueError("Token usage is not reported for streamed searches")
 
     # Apply function to each row
+    import tqdm
     tqdm.tqdm.pandas(desc="Processing queries")  # Enable progress bar
     df = df.copy()
-    df[response_col] = df.progress_apply(search_row, axis=1)
+    if stream or stop_condition is not None:
+        # Streaming also records time-to-first-token and generation time per row
+        timing_cols = [response_col, f'{response_col}_ttft', f'{response_col}_generation_time', f'{response_col}_stopped_early']
+        df[timing_cols] = df.progress_apply(stream_row, axis=1)
+    elif samples > 1:
+        # All samples of a row come from one call, the first one doubles as the row's response
+        samples_col = f'{response_col}_samples'
+        usage_cols = [f'{response_col}_prompt_tokens', f'{response_col}_cached_tokens']
+        sampled = df.progress_apply(sample_row, axis=1)
+        sampled.columns = [samples_col] + usage_cols
+        df[samples_col] = sampled[samples_col]
+        df[response_col] = df[samples_col].map(lambda texts: texts[0] if texts else None)
+        if usage:
+            df[usage_cols] = sampled[usage_cols]
+    elif usage:
+        # Per row token usage, cached_tokens shows how much of the prompt the provider served from its cache
+        df[[response_col, f'{response_col}_prompt_tokens', f'{response_col}_cached_tokens']] = df.progress_apply(usage_row, axis=1)
+    else:
+        df[response_col] = df.progress_apply(search_row, axis=1)
+    if samples <= 1 and f'{response_col}_samples' in df.columns:
+        # Samples of an earlier search no longer belong to the response
+        df = df.drop(columns=[f'{response_col}_samples'])
     return df
 
-def batch_evaluate(df, response_col = 'response', sources_col = 'cleaned_sources', evaluation_col='evaluation_results') -> pd.DataFrame:
+@profiled()
+def batch_search_async(df, connector, query_col='query', sources_col='cleaned_sources', response_col='response', concurrency=64, pool=None, layout='default') -> pd.DataFrame:
+    """Same as `batch_search_vectorized`, but keeps up to `concurrency` searches in flight on the connector event loop."""
+    async def search_all():
+        coros = [perform_search_async(query, resolve_many(sources, pool), connector, layout=layout) for query, sources in zip(df[query_col], df[sources_col])]
+        return await gather_limited(coros, concurrency)
+
+    df = df.copy()
+    df[response_col] = [_store(response, pool) for response in run_async(search_all())]
+    return df
+
+@profiled()
+def batch_evaluate(df, response_col = 'response', sources_col = 'cleaned_sources', evaluation_col='evaluation_results', pool=None) -> pd.DataFrame:
+    """
+    Scores every response. If the search was sampled (a `{response_col}_samples` column), all samples
+    are scored into `{evaluation_col}_samples` and `evaluation_col` holds their per-source mean.
+    """
+    samples_col = f'{response_col}_samples'
+
     def evaluate_row(row):
-        return evaluate(row[response_col], row[sources_col])
+        return evaluate(resolve(row[response_col], pool), resolve_many(row[sources_col], pool))
+
+    def evaluate_samples_row(row):
+        return evaluate_samples(resolve_many(row[samples_col], pool), resolve_many(row[sources_col], pool))
 
     # Apply function to each row
+    import tqdm
     tqdm.tqdm.pandas(desc="Processing evaluations")  # Enable progress bar
     df = df.copy()
-    df[evaluation_col] = df.progress_apply(evaluate_row, axis=1)
+    if samples_col in df.columns:
+        df[f'{evaluation_col}_samples'] = df.progress_apply(evaluate_samples_row, axis=1)
+        df[evaluation_col] = df[f'{evaluation_col}_samples'].map(mean_scores)
+    else:
+        df[evaluation_col] = df.progress_apply(evaluate_row, axis=1)
     return df
 
-def batch_choose_edit(df, method, connector, cumulative, format) -> pd.DataFrame:
+@profiled()
+def batch_choose_edit(df, method, connector, cumulative, format, pool=None, layout='default') -> pd.DataFrame:
 
     def choose_doc_row(row):
         scores = [(a*0.5+b*0.5) for a,b in row['evaluation_results']]
         return choose_document(row['cleaned_sources'], scores)
     def edit_doc_row(row,cumulative):
-        edited_doc = edit_document(method, row['cleaned_sources'][row['choosen_doc_idx']], query=row['query'], connector=connector)
+        source = resolve(row['cleaned_sources'][row['choosen_doc_idx']], pool)
+        edited_doc = edit_document(method, source, query=row['query'], connector=connector, layout=layout)
         if cumulative:
-            return format.format(source=row['cleaned_sources'][row['choosen_doc_idx']], section=edited_doc)
-        return edited_doc
+            return _store(format.format(source=source, section=edited_doc), pool)
+        return _store(edited_doc, pool)
 
     def replace_doc_row(row):
         sources = row['cleaned_sources'].copy()
         sources[row['choosen_doc_idx']] = row['choosen_doc_edited']
         return sources
 
+    import tqdm
     tqdm.tqdm.pandas(desc="Choosing and Editing Document")
     df = df.copy()
     df['choosen_doc_idx'] = df.progress_apply(choose_doc_row, axis=1)
@@ -51,20 +147,42 @@ def batch_choose_edit(df, method, connector, cumulative, format) -> pd.DataFrame
     df['cleaned_sources'] = df.progress_apply(replace_doc_row, axis=1)
     return df
 
+@profiled()
 def batch_evaluate_diff(df, old_results_col = 'evaluation_results', new_results_col = 'evaluation_results_new', output_col = 'evaluation_diff') -> pd.DataFrame:
     def evaluate_diff_row(row):
         return evaluate_diff(row[old_results_col], row[new_results_col])
+
+    def stderr_row(row):
+        old = row[f'{old_results_col}_samples'] if f'{old_results_col}_samples' in row else []
+        old = old if isinstance(old, list) else []
+        return combined_stderr(sample_stderr(old), sample_stderr(row[f'{new_results_col}_samples']))
+
+    import tqdm
     tqdm.tqdm.pandas(desc="Processing evaluation differences")
     df = df.copy()
     df[output_col] = df.progress_apply(evaluate_diff_row, axis=1)
+    if f'{new_results_col}_samples' in df.columns:
+        # Sampling error of every difference, from the spread of the sampled scores
+        df[f'{output_col}_stderr'] = df.apply(stderr_row, axis=1)
     return df
 
-def run_pipeline(original_df,connector, batch_size, batch_timeout, save_intermediate=True, saving_path = './search_results/'):
+def run_pipeline(original_df,connector, batch_size, batch_timeout, save_intermediate=True, saving_path = './search_results/', shard=None, pool=None, samples=1, sample_temp=1.0, prompt_layout='default'):
+    metrics = get_recorder()
+    run_start = metrics.mark()  # the summary covers this run only
 
     ## Preprocessing
     print("Starting preprocessing...")
     # df = clean_dataset(original_df)
     df = parse_dataset(original_df)
+    if shard is not None:
+        # Only this worker's rows, checkpointed under their own directory (see sharding.py)
+        df = select_shard(df, shard)
+        saving_path = shard_path(saving_path, shard)
+        os.makedirs(saving_path, exist_ok=True)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(df)} rows")
+    if pool is not None:
+        # Rows hold text pool ids from here on, the pool is saved next to the results
+        df = intern_frame(df, pool)
     batches = create_batches(df, batch_size=batch_size)
     if batch_timeout:
         batches = batches[:batch_timeout]  # Limit to batch_timeout batches if specified
@@ -75,7 +193,8 @@ def run_pipeline(original_df,connector, batch_size, batch_timeout, save_intermed
         print(f"Processing batch {i+1}/{len(batches)}")
         print(f"Batch size: {len(batch)}")
         if not batch.get('batch_nr'):
-            batch = batch_search_vectorized(batch, connector)
+            with metrics.stage('search', rows=len(batch)):
+                batch = batch_search_vectorized(batch, connector, pool=pool, samples=samples, sample_temp=sample_temp, layout=prompt_layout, usage=prompt_layout == 'prefix')
             batch['batch_nr'] = i + 1
             batches[i] = batch
 
@@ -87,19 +206,33 @@ def run_pipeline(original_df,connector, batch_size, batch_timeout, save_intermed
 
     for i, batch in enumerate(batches):
         print(f"Evaluating batch {i+1}/{len(batches)}")
-        batch = batch_evaluate(batch)
+        with metrics.stage('evaluate', rows=len(batch)):
+            batch = batch_evaluate(batch, pool=pool)
         batches[i] = batch
 
     if save_intermediate:
         save_object(batches, saving_path + 'search_results_evaluated.pkl')
+        if pool is not None:
+            save_object(pool, saving_path + 'text_pool.pkl')
 
-    return pd.concat(batches, ignore_index=True)
+    print_metrics_summary(metrics, method_name="search", since=run_start)
+    print_profile_summary("search")
+    return _concat(batches, df)
 
 
-def run_method(df,method,connector, batch_size, batch_timeout,edit_prompt, cumulative,save_intermediate=True, saving_path = './search_results/'):
+def run_method(df,method,connector, batch_size, batch_timeout,edit_prompt, cumulative,save_intermediate=True, saving_path = './search_results/', shard=None, pool=None, samples=1, sample_temp=1.0, prompt_layout='default', edited_last=False):
 
+    metrics = get_recorder()
+    run_start = metrics.mark()  # the summary covers this run only
     print("Starting preprocessing...")
     df = parse_dataset(df) 
+    if shard is not None:
+        df = select_shard(df, shard)
+        saving_path = shard_path(saving_path, shard)
+        os.makedirs(saving_path, exist_ok=True)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(df)} rows")
+    if pool is not None:
+        df = intern_frame(df, pool)
     batches = create_batches(df, batch_size)
     if batch_timeout:
         batches = batches[:batch_timeout]
@@ -107,24 +240,39 @@ def run_method(df,method,connector, batch_size, batch_timeout,edit_prompt, cumul
     for i, batch in enumerate(batches):
         print(f"Processing batch {i+1}/{len(batches)}")
 
+        if samples > 1 and not _has_samples(batch, 'evaluation_results_samples'):
+            # A single temperature 0 baseline against sampled edited searches would mix the
+            # temperature change into the differences, so the baseline is sampled the same way
+            print("Sampling the baseline search...")
+            with metrics.stage('baseline_search', method=method, rows=len(batch)):
+                batch = batch_search_vectorized(batch, connector, pool=pool, samples=samples, sample_temp=sample_temp,
+                                                layout=prompt_layout, usage=prompt_layout == 'prefix')
+            with metrics.stage('baseline_evaluate', method=method, rows=len(batch)):
+                batch = batch_evaluate(batch, pool=pool)
+
         print("Choosing and editing documents...")
-        batch = batch_choose_edit(batch, method, connector,cumulative=cumulative,format=edit_prompt)
+        with metrics.stage('choose_edit', method=method, rows=len(batch)):
+            batch = batch_choose_edit(batch, method, connector,cumulative=cumulative,format=edit_prompt, pool=pool, layout=prompt_layout)
         if save_intermediate:
             save_object(batch,saving_path +f'method_{method}_batch{i+1}.pkl')
 
         print("Searching documents...")
-        batch = batch_search_vectorized(batch, connector, query_col='query', sources_col='cleaned_sources', response_col='response_new')
+        with metrics.stage('search', method=method, rows=len(batch)):
+            batch = batch_search_vectorized(batch, connector, query_col='query', sources_col='cleaned_sources', response_col='response_new', pool=pool, samples=samples, sample_temp=sample_temp,
+                                            layout=prompt_layout, volatile_col='choosen_doc_idx' if edited_last else None, usage=prompt_layout == 'prefix')
         if save_intermediate:
             save_object(batch,saving_path +f'method_{method}_batch{i+1}.pkl')
 
         print("Evaluating documents...")
-        batch = batch_evaluate(batch,response_col='response_new',sources_col='cleaned_sources',evaluation_col='evaluation_results_new')
+        with metrics.stage('evaluate', method=method, rows=len(batch)):
+            batch = batch_evaluate(batch,response_col='response_new',sources_col='cleaned_sources',evaluation_col='evaluation_results_new', pool=pool)
         if save_intermediate:
             save_object(batch,saving_path +f'method_{method}_batch{i+1}.pkl')
 
 
         print("Evaluating the differences")
-        batch = batch_evaluate_diff(batch, old_results_col='evaluation_results', new_results_col='evaluation_results_new', output_col='evaluation_diff')
+        with metrics.stage('evaluate_diff', method=method, rows=len(batch)):
+            batch = batch_evaluate_diff(batch, old_results_col='evaluation_results', new_results_col='evaluation_results_new', output_col='evaluation_diff')
         if save_intermediate:
             save_object(batch,saving_path +f'method_{method}_batch{i+1}.pkl')
 
@@ -134,5 +282,9 @@ def run_method(df,method,connector, batch_size, batch_timeout,edit_prompt, cumul
 
     if save_intermediate:
         save_object(batches, saving_path + f'method_{method}.pkl')
+        if pool is not None:
+            save_object(pool, saving_path + 'text_pool.pkl')
 
-    return pd.concat(batches, ignore_index=True)
\ No newline at end of file
+    print_metrics_summary(metrics, method_name=method, since=run_start)
+    print_profile_summary(method)
+    return _concat(batches, df)
\ No newline at end of file
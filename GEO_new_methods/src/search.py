@@ -1,39 +1,52 @@
-from typing import List
+from typing import List, Optional, Tuple
 from connector.connector import Connector
+from connector.responses import response_text, response_texts, response_usage
+from connector.streaming import GenerationStream, StopCondition
 
 
+# 'default': query, then the sources in order.
+# 'prefix': sources first and the query last, so searches over the same sources share a prompt
+# prefix that providers can cache; a volatile source (e.g. the edited one) goes after the others.
+PROMPT_LAYOUTS = ('default', 'prefix')
 
 
-def perform_search( query: str, sources: List[str], connector: Connector, system_prompt_file = './prompts/search_normal.txt', temp=0, top_p=1) -> str | None:
+def _build_search_prompt(query: str, sources: List[str], system_prompt_file: str, layout: str = 'default', volatile_idx: Optional[int] = None) -> Tuple[str | None, str]:
     """
-    Performs a search by reading system prompt from a file and calling the provided connector.
-    
+    Builds the system and user prompt of a search.
+
     Args:
-        sources (List[str]): List of text documents to use as context.
-        query (str): The user's search query.
-        connector: Connector instance (e.g., ChatGPTConnector) with a call method.
-        system_prompt_file (str): Path to text file containing the system prompt.
-        temp (float, optional): Temperature setting for generation. Defaults to 0.7.
-        top_p (float, optional): Top_p setting for generation. Defaults to 1.0.
-    
+        layout (str): One of PROMPT_LAYOUTS.
+        volatile_idx (Optional[int]): With the 'prefix' layout, the source that changes between otherwise
+            identical searches. It is placed after the other sources and keeps its "Source k" label.
+
     Returns:
-        str: Response from the connector based on the search.
+        Tuple[str | None, str]: (system_prompt, prompt), or (None, error message) if the inputs are invalid.
     """
     # Read system prompt from file
     try:
         with open(system_prompt_file, 'r', encoding='utf-8') as f:
             system_prompt = f.read().strip()
     except FileNotFoundError:
-        return f"Error: System prompt file '{system_prompt_file}' not found."
+        return None, f"Error: System prompt file '{system_prompt_file}' not found."
     except Exception as e:
-        return f"Error reading system prompt file: {str(e)}"
+        return None, f"Error reading system prompt file: {str(e)}"
     
     # Validate inputs
     if not sources or not query.strip():
-        return "Error: Please provide both source documents and a valid query."
+        return None, "Error: Please provide both source documents and a valid query."
     
     if not system_prompt:
-        return "Error: System prompt file is empty."
+        return None, "Error: System prompt file is empty."
+
+    if layout not in PROMPT_LAYOUTS:
+        return None, f"Error: Unknown prompt layout '{layout}', expected one of {PROMPT_LAYOUTS}."
+
+    if layout == 'prefix':
+        order = [idx for idx in range(len(sources)) if idx != volatile_idx]
+        if volatile_idx is not None and 0 <= volatile_idx < len(sources):
+            order.append(volatile_idx)
+        source_text = '\n\n'.join([f'### Source {idx+1}:\n{sources[idx]}\n\n\n' for idx in order])
+        return system_prompt, f"Search Results:\n{source_text}\n\nQuery: {query}\n"
     
     query_prompt = """
         Query: {query}
@@ -46,10 +59,102 @@ def perform_search( query: str, sources: List[str], connector: Connector, system
     prompt = query_prompt.format(query=query, source_text=source_text)
 
     
+    return system_prompt, prompt
+
+
+def perform_search( query: str, sources: List[str], connector: Connector, system_prompt_file = './prompts/search_normal.txt', temp=0, top_p=1, layout='default', volatile_idx=None, return_usage=False) -> str | None | Tuple[str | None, dict]:
+    """
+    Performs a search by reading system prompt from a file and calling the provided connector.
+    
+    Args:
+        sources (List[str]): List of text documents to use as context.
+        query (str): The user's search query.
+        connector: Connector instance (e.g., ChatGPTConnector) with a call method.
+        system_prompt_file (str): Path to text file containing the system prompt.
+        temp (float, optional): Temperature setting for generation. Defaults to 0.7.
+        top_p (float, optional): Top_p setting for generation. Defaults to 1.0.
+        layout (str, optional): Prompt layout, one of PROMPT_LAYOUTS. Defaults to 'default'.
+        volatile_idx (int, optional): Source placed last by the 'prefix' layout.
+        return_usage (bool, optional): Also return the token usage of the call (see `response_usage`),
+            e.g. to check how many prompt tokens the provider served from its cache.
+    
+    Returns:
+        str: Response from the connector based on the search, or (response, usage) with `return_usage`.
+    """
+    system_prompt, prompt = _build_search_prompt(query, sources, system_prompt_file, layout, volatile_idx)
+    if system_prompt is None:
+        return (prompt, {}) if return_usage else prompt
+
     # Call the provided connector
     try:
         response = connector.call(system_prompt, prompt, temp, top_p)
-        return response.choices[0].message.content
+        text = response_text(response)
+        return (text, response_usage(response)) if return_usage else text
+    except Exception as e:
+        error = f"Error during connector call: {str(e)}"
+        return (error, {}) if return_usage else error
+
+
+def perform_search_samples( query: str, sources: List[str], connector: Connector, n: int, system_prompt_file = './prompts/search_normal.txt', temp=1, top_p=1, layout='default', volatile_idx=None, return_usage=False) -> List[str] | str | Tuple[List[str] | str, dict]:
+    """
+    Samples `n` responses to one search in a single call (OpenAI `n`, Gemini `candidate_count`),
+    so the prompt is sent and billed once. Sampling needs a temperature above 0 to give different answers.
+
+    Returns:
+        List[str] | str: The sampled responses, or an error message. With `return_usage`,
+            (samples, usage) as for `perform_search`.
+    """
+    system_prompt, prompt = _build_search_prompt(query, sources, system_prompt_file, layout, volatile_idx)
+    if system_prompt is None:
+        return (prompt, {}) if return_usage else prompt
+
+    usage = {}
+    try:
+        response = connector.call(system_prompt, prompt, temp, top_p, n=n)
+        texts = response_texts(response)
+        usage = response_usage(response)
+    except Exception as e:
+        texts = f"Error during connector call: {str(e)}"
+    if not texts:
+        # e.g. a Gemini response without candidates for a blocked prompt
+        texts = "Error during connector call: no samples returned"
+    return (texts, usage) if return_usage else texts
+
+
+def perform_search_stream( query: str, sources: List[str], connector: Connector, system_prompt_file = './prompts/search_normal.txt', temp=0, top_p=1, stop_condition: StopCondition | None = None, layout='default', volatile_idx=None) -> GenerationStream | str:
+    """
+    Performs a search with a streamed response.
+
+    Args:
+        stop_condition (StopCondition, optional): Ends generation early once it returns True for the text
+            received so far, e.g. `max_sentences(5)` or `max_citations(3)`.
+
+    Returns:
+        GenerationStream | str: The consumed stream (text, time_to_first_token, total_time, stopped_early),
+            or an error message.
+    """
+    system_prompt, prompt = _build_search_prompt(query, sources, system_prompt_file, layout, volatile_idx)
+    if system_prompt is None:
+        return prompt
+
+    try:
+        stream = connector.stream(system_prompt, prompt, temp, top_p, stop_condition=stop_condition)
+        stream.consume()
+        return stream
+    except Exception as e:
+        return f"Error during connector call: {str(e)}"
+
+
+async def perform_search_async( query: str, sources: List[str], connector: Connector, system_prompt_file = './prompts/search_normal.txt', temp=0, top_p=1, layout='default', volatile_idx=None) -> str | None:
+    """
+    Same as `perform_search`, but awaits `connector.acall` so many searches can share one event loop.
+    """
+    system_prompt, prompt = _build_search_prompt(query, sources, system_prompt_file, layout, volatile_idx)
+    if system_prompt is None:
+        return prompt
+
+    try:
+        response = await connector.acall(system_prompt, prompt, temp, top_p)
+        return response_text(response)
     except Exception as e:
         return f"Error during connector call: {str(e)}"
-    
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Deterministic sharding of pipeline runs.
+
+Rows are assigned to one of N shards by a stable hash of their query, so every worker
+selects the same rows without coordination. Each shard writes its checkpoints to its own
+directory under the saving path; `merge_shards` (or the `merge` command) combines the
+shard outputs and checks that every shard finished and every query is present once.
+Shards run with a text pool number their ids independently; the merge restores the texts
+from each shard's `text_pool.pkl`, or re-interns them into one merged pool.
+
+    # on worker i of 4
+    run_method(df, method, connector, ..., saving_path='./search_results/', shard=(i, 4))
+
+    # afterwards, on any machine with all shard directories
+    python -m GEO_new_methods.src.sharding merge --saving-path ./search_results/ --num-shards 4 \\
+        --file method_summary.pkl --expected GEO_new_methods/data/processed_test.csv
+"""
+import argparse
+import hashlib
+import os
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from GEO_new_methods.src.textpool import TextPool, intern_frame, is_interned, materialize_frame
+from GEO_new_methods.src.utils import load_object, save_object
+
+Shard = Tuple[int, int]
+
+
+def shard_of(query: str, num_shards: int) -> int:
+    """Shard index of a query, stable across processes, machines and Python versions."""
+    digest = hashlib.sha1(str(query).encode('utf-8')).hexdigest()
+    return int(digest[:16], 16) % num_shards
+
+
+def select_shard(df: pd.DataFrame, shard: Shard, query_col: str = 'query') -> pd.DataFrame:
+    """Rows of `df` belonging to shard (index, num_shards)."""
+    index, num_shards = validate_shard(shard)
+    mask = df[query_col].map(lambda q: shard_of(q, num_shards) == index)
+    return df[mask]
+
+
+def validate_shard(shard: Shard) -> Shard:
+    index, num_shards = shard
+    if num_shards < 1 or not 0 <= index < num_shards:
+        raise ValueError(f"Invalid shard {index} of {num_shards}")
+    return index, num_shards
+
+
+def shard_path(saving_path: str, shard: Shard) -> str:
+    """Checkpoint directory of a shard, e.g. './search_results/shard_001_of_004/'."""
+    index, num_shards = validate_shard(shard)
+    return os.path.join(saving_path, f'shard_{index:03d}_of_{num_shards:03d}', '')
+
+
+def _load_frame(path: str, query_col: str = 'query') -> pd.DataFrame:
+    obj = load_object(path)
+    if isinstance(obj, pd.DataFrame):
+        return obj
+    batches = list(obj)
+    if not batches:
+        # A shard without rows saves an empty list of batches
+        return pd.DataFrame(columns=[query_col])
+    return pd.concat(batches, ignore_index=True)
+
+
+def merge_shards(saving_path: str, num_shards: int, filename: str, expected: Optional[pd.DataFrame] = None,
+                 query_col: str = 'query', required_cols: Optional[List[str]] = None, pool: Optional[TextPool] = None) -> pd.DataFrame:
+    """
+    Combines the output file `filename` of all shards and validates completeness.
+
+    Args:
+        saving_path (str): The saving path the shards were run with.
+        num_shards (int): Number of shards of the run.
+        filename (str): Output file written by every shard, e.g. 'method_summary.pkl'.
+        expected (Optional[pd.DataFrame]): Full input dataset; every query must then appear
+            in the merge exactly as often as in the input.
+        query_col (str): Column the shards were assigned by.
+        required_cols (Optional[List[str]]): Columns that must be present and non-null in every row.
+        pool (Optional[TextPool]): Pool to re-intern the texts of interned shards into. Without
+            one, interned shards are merged with their texts restored.
+
+    Returns:
+        pd.DataFrame: The merged rows with a `shard` column.
+
+    Raises:
+        ValueError: If a shard output is missing, a row is in the wrong shard, rows are
+            missing or duplicated, a required column is empty, or an interned shard has
+            no `text_pool.pkl`.
+    """
+    missing_files = []
+    frames = []
+    for index in range(num_shards):
+        path = shard_path(saving_path, (index, num_shards)) + filename
+        if not os.path.exists(path):
+            missing_files.append(path)
+            continue
+        frame = _load_frame(path, query_col).copy()
+        if is_interned(frame):
+            # Shard ids only index that shard's own pool
+            pool_path = shard_path(saving_path, (index, num_shards)) + 'text_pool.pkl'
+            if not os.path.exists(pool_path):
+                raise ValueError(f"Shard {index} holds text pool ids but has no text pool ({pool_path})")
+            frame = materialize_frame(frame, load_object(pool_path))
+            if pool is not None:
+                frame = intern_frame(frame, pool)
+        misplaced = frame[query_col].map(lambda q: shard_of(q, num_shards) != index)
+        if misplaced.any():
+            raise ValueError(f"Shard {index} contains {int(misplaced.sum())} rows of other shards ({path})")
+        frame['shard'] = index
+        frames.append(frame)
+    if missing_files:
+        raise ValueError("Missing shard outputs:\n" + "\n".join(missing_files))
+
+    # Empty shards only add columns, and pandas warns about concatenating them
+    merged = pd.concat([frame for frame in frames if len(frame)] or frames, ignore_index=True)
+
+    if expected is not None:
+        want, got = Counter(expected[query_col]), Counter(merged[query_col])
+        missing = want - got
+        extra = got - want
+        if missing or extra:
+            raise ValueError(f"Incomplete merge: {sum(missing.values())} rows missing, {sum(extra.values())} unexpected "
+                             f"(e.g. {list((missing or extra).keys())[:3]})")
+
+    for col in required_cols or []:
+        if col not in merged.columns:
+            raise ValueError(f"Column '{col}' is missing from the shard outputs")
+        empty = merged[col].isna()
+        if empty.any():
+            raise ValueError(f"Column '{col}' is empty in {int(empty.sum())} rows")
+
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the outputs of a sharded run.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    merge = sub.add_parser('merge', help="combine and validate shard outputs")
+    merge.add_argument('--saving-path', default='./search_results/')
+    merge.add_argument('--num-shards', type=int, required=True)
+    merge.add_argument('--file', required=True, help="shard output file, e.g. method_summary.pkl")
+    merge.add_argument('--expected', help="CSV of the full input dataset to check completeness against")
+    merge.add_argument('--require', nargs='*', default=[], help="columns that must be non-null in every row")
+    merge.add_argument('--output', help="where to save the merged DataFrame (defaults to <saving-path>/<file>)")
+    args = parser.parse_args(argv)
+
+    expected = pd.read_csv(args.expected) if args.expected else None
+    pool = TextPool()
+    merged = merge_shards(args.saving_path, args.num_shards, args.file, expected=expected, required_cols=args.require, pool=pool)
+    output = args.output or os.path.join(args.saving_path, args.file)
+    save_object(merged, output)
+    print(f"Merged {len(merged)} rows from {args.num_shards} shards into {output}")
+    if len(pool):
+        pool_output = os.path.join(os.path.dirname(output), 'text_pool.pkl')
+        save_object(pool, pool_output)
+        print(f"Saved the merged text pool ({len(pool)} texts) to {pool_output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Content-hashed pool of the texts shared between rows, batches and methods.
+
+Every method frame carries the same five source documents per query and the same baseline
+response, once per row and once per method. Interning a frame replaces those texts with
+integer ids into a shared `TextPool`, so each distinct text is held once:
+
+    pool = TextPool()
+    frames = {method: intern_frame(parse_dataset(pd.read_csv(path)), pool) for method, path in paths.items()}
+
+    sources = pool.texts(row['cleaned_sources'])    # only when a prompt is built or evaluated
+    full = materialize_frame(frames['summary'], pool)
+
+The pipeline stages accept `pool=` and resolve ids themselves, rows without ids pass through unchanged.
+"""
+import hashlib
+import numbers
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+# Columns holding a list of texts per row, and columns holding a single text
+LIST_TEXT_COLUMNS = ('cleaned_sources', 'response_samples', 'response_new_samples')
+TEXT_COLUMNS = ('response', 'choosen_doc_edited', 'response_new')
+
+
+class TextPool:
+    """Stores every distinct text once, addressed by an integer id in insertion order."""
+
+    def __init__(self):
+        self._texts: List[str] = []
+        self._ids: Dict[bytes, int] = {}
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def intern(self, text: str) -> int:
+        """Id of `text`, adding it to the pool if it is new."""
+        key = self._key(text)
+        text_id = self._ids.get(key)
+        if text_id is None:
+            text_id = len(self._texts)
+            self._ids[key] = text_id
+            self._texts.append(text)
+        return text_id
+
+    def intern_many(self, texts: Iterable[str]) -> List[int]:
+        return [self.intern(text) for text in texts]
+
+    def text(self, text_id: int) -> str:
+        return self._texts[text_id]
+
+    def texts(self, text_ids: Sequence[int]) -> List[str]:
+        return [self._texts[i] for i in text_ids]
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, text: str) -> bool:
+        return self._key(text) in self._ids
+
+    @property
+    def nbytes(self) -> int:
+        """UTF-8 size of the pooled texts."""
+        return sum(len(text.encode('utf-8')) for text in self._texts)
+
+
+def resolve(value, pool: Optional[TextPool]):
+    """The text behind `value` if it is a pool id, otherwise `value` itself."""
+    if pool is not None and isinstance(value, numbers.Integral):
+        return pool.text(value)
+    return value
+
+
+def resolve_many(values, pool: Optional[TextPool]):
+    """Texts behind a list of pool ids, plain lists of texts pass through."""
+    if pool is None or not isinstance(values, (list, tuple)):
+        return values
+    return [resolve(value, pool) for value in values]
+
+
+def _intern_value(value, pool: TextPool):
+    return pool.intern(value) if isinstance(value, str) else value
+
+
+def intern_frame(df: pd.DataFrame, pool: TextPool, list_cols: Sequence[str] = LIST_TEXT_COLUMNS,
+                 text_cols: Sequence[str] = TEXT_COLUMNS, drop: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    Replaces the text columns of a parsed frame with pool ids.
+
+    Args:
+        df (pd.DataFrame): Parsed frame (list columns already converted by `parse_dataset`).
+        pool (TextPool): Pool shared by all frames that should deduplicate against each other.
+        list_cols (Sequence[str]): Columns holding a list of texts per row.
+        text_cols (Sequence[str]): Columns holding one text per row.
+        drop (Sequence[str]): Columns to remove, e.g. the raw 'sources' once 'cleaned_sources' is parsed.
+
+    Returns:
+        pd.DataFrame: A copy with ids in place of the texts; missing columns are skipped.
+    """
+    df = df.drop(columns=[col for col in drop if col in df.columns])
+    for col in list_cols:
+        if col in df.columns:
+            df[col] = df[col].map(lambda texts: [_intern_value(t, pool) for t in texts] if isinstance(texts, (list, tuple)) else texts)
+    for col in text_cols:
+        if col in df.columns:
+            df[col] = df[col].map(lambda text: _intern_value(text, pool)).astype(object)
+    return df
+
+
+def is_interned(df: pd.DataFrame, list_cols: Sequence[str] = LIST_TEXT_COLUMNS,
+                text_cols: Sequence[str] = TEXT_COLUMNS) -> bool:
+    """True if any text column of `df` holds pool ids."""
+    def is_id(value):
+        return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+    for col in list_cols:
+        if col in df.columns and df[col].map(lambda values: isinstance(values, (list, tuple)) and any(map(is_id, values))).any():
+            return True
+    return any(col in df.columns and df[col].map(is_id).any() for col in text_cols)
+
+
+def materialize_frame(df: pd.DataFrame, pool: TextPool, list_cols: Sequence[str] = LIST_TEXT_COLUMNS,
+                      text_cols: Sequence[str] = TEXT_COLUMNS) -> pd.DataFrame:
+    """Inverse of `intern_frame`, returns a copy with the texts restored."""
+    df = df.copy()
+    for col in list_cols:
+        if col in df.columns:
+            df[col] = df[col].map(lambda ids: resolve_many(ids, pool))
+    for col in text_cols:
+        if col in df.columns:
+            df[col] = df[col].map(lambda value: resolve(value, pool)).astype(object)
+    return df
@@ -1,10 +1,12 @@
-import pandas as pd
 import pickle
+from instrumentation.profiling import profiled
 
+@profiled()
 def save_object(obj, filename):
     with open(filename, 'wb') as f:
         pickle.dump(obj, f)
 
+@profiled()
 def load_object(filename):
     with open(filename, 'rb') as f:
         return pickle.load(f)
@@ -1,5 +1,11 @@
+import os
 import requests
 
+from connector.singleflight import single_flight
+
+# Overridable to point the embeddings at a local stand-in (see jina_stub.py)
+JINA_EMBEDDINGS_URL = os.environ.get('JINA_EMBEDDINGS_URL', 'https://api.jina.ai/v1/embeddings')
+
 def get_jina_embeddings(docs: list[str], jina_api_key: str) -> list:
     """
     Get embeddings from Jina AI API for a list of text inputs.
@@ -18,6 +24,8 @@ def get_jina_embeddings(docs: list[str], jina_api_key: str) -> list:
     return list_emb
 
 
+# Concurrent requests for the same input share one HTTP request
+@single_flight('jina_embeddings')
 def get_embedding(text: str, jina_api_key: str) -> dict:
     """
     Get embedding from Jina AI API for a single text input.
@@ -28,7 +36,7 @@ def get_embedding(text: str, jina_api_key: str) -> dict:
     Returns:
         dict: Embedding object (dict) as returned by the API, having 'object', 'index', and 'embedding' keys.
     """
-    url = 'https://api.jina.ai/v1/embeddings'
+    url = JINA_EMBEDDINGS_URL
     headers = {
         'Content-Type': 'application/json',
         'Authorization': f'Bearer {jina_api_key}'
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import numpy as np
+
+from connector.replay import LatencyDistribution, constant
+from Similarity_Approach.src import embedding, reader
+
+
+class JinaStubServer:
+    """
+    Local stand-in for the Jina reader (GET /<url>) and embeddings (POST /v1/embeddings) endpoints.
+
+    Pages are served from `pages` (url -> markdown) or generated from the url, embeddings are
+    deterministic unit vectors derived from the text hash. Used as a context manager, the
+    server points reader.py and embedding.py at itself and restores them on exit.
+
+        with JinaStubServer.from_checkpoints(latency=lognormal(0.4)) as server:
+            run_pipeline(query, connector, jina_api_key="stub", search_api_key="stub", ...)
+    """
+
+    def __init__(self, pages: Optional[Dict[str, str]] = None, latency: Optional[LatencyDistribution] = None,
+                 dimensions: int = 1024, host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        self.pages = pages or {}
+        self.latency = latency or constant(0.0)
+        self.dimensions = dimensions
+        self.seed = seed
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._previous = None
+
+    @classmethod
+    def from_checkpoints(cls, checkpoint_dir: Optional[str] = None, **kwargs):
+        """Serves the pages stored in the Similarity_Approach checkpoints under their urls."""
+        checkpoint_dir = checkpoint_dir or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'checkpoints')
+
+        def load(name):
+            path = os.path.join(checkpoint_dir, name)
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                return json.load(f)
+
+        pages = {}
+        pairs = [
+            ('chatgpt_search.json', 'webpages.json'),
+            ('gemini_search.json', 'gemini_webpages.json'),
+            ('google_search.json', 'google_search_webpages.json'),
+        ]
+        for search_name, pages_name in pairs:
+            search, contents = load(search_name), load(pages_name)
+            if not search or not contents:
+                continue
+            urls = search['urls'] if isinstance(search, dict) else search
+            pages.update(zip(urls, contents))
+        return cls(pages, **kwargs)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def page(self, url: str) -> str:
+        return self.pages.get(url) or f"Title: {url}\n\nURL Source: {url}\n\nMarkdown Content:\nStub page for {url}.\n"
+
+    def embed(self, text: str) -> list:
+        digest = hashlib.sha256(f"{self.seed}:{text}".encode('utf-8')).digest()
+        vector = np.random.default_rng(int.from_bytes(digest[:8], 'little')).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).round(8).tolist()
+
+    def _delay(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency(self._rng, None)
+        time.sleep(delay)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, body: bytes, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stub._delay()
+                self._send(200, stub.page(self.path[1:]).encode('utf-8'), 'text/plain; charset=utf-8')
+
+            def do_POST(self):
+                stub._delay()
+                if self.path.rstrip('/') != '/v1/embeddings':
+                    return self._send(404, b'{"detail": "Not Found"}', 'application/json')
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                inputs = payload.get('input', [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                body = {
+                    'model': payload.get('model'),
+                    'object': 'list',
+                    'usage': {'total_tokens': sum(len(t.split()) for t in inputs)},
+                    'data': [{'object': 'embedding', 'index': i, 'embedding': stub.embed(t)} for i, t in enumerate(inputs)],
+                }
+                self._send(200, json.dumps(body).encode('utf-8'), 'application/json')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='jina-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        self._previous = (reader.JINA_READER_URL, embedding.JINA_EMBEDDINGS_URL)
+        reader.JINA_READER_URL = self.url
+        embedding.JINA_EMBEDDINGS_URL = self.url + 'v1/embeddings'
+        return self
+
+    def __exit__(self, *exc):
+        reader.JINA_READER_URL, embedding.JINA_EMBEDDINGS_URL = self._previous
+        self.stop()
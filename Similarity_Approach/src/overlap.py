@@ -1,22 +1,197 @@
-from urllib.parse import urlparse
+import ipaddress
+from collections import defaultdict
+from itertools import combinations
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Second level suffixes under which the registrable domain has three labels: common country
+# suffixes, and hosting suffixes whose subdomains belong to different sites.
+MULTI_PART_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au', 'co.nz', 'co.jp', 'co.in',
+    'co.za', 'com.br', 'com.cn', 'com.mx', 'com.tr', 'com.sg', 'co.kr', 'or.jp', 'ne.jp', 'gv.at', 'co.at',
+    'github.io', 'gitlab.io', 'blogspot.com', 'wordpress.com', 'medium.com', 'substack.com', 'netlify.app',
+    'vercel.app', 'pages.dev', 'herokuapp.com', 'web.app', 'firebaseapp.com', 'azurewebsites.net',
+    'cloudfront.net', 'appspot.com', 'wixsite.com', 'squarespace.com', 'notion.site', 'readthedocs.io',
+}
+
+TRACKING_PARAMS = {'gclid', 'fbclid', 'msclkid', 'dclid', 'yclid', 'mc_cid', 'mc_eid', 'ref', 'ref_src', 'srsltid', '_hsenc', '_hsmi'}
+
+
+class Posting(NamedTuple):
+    """Where a url or domain was seen: the query, the source that returned it and its 1-based rank."""
+    query: str
+    source: str
+    rank: int
+
+
+def registrable_domain(url: str) -> str:
+    """
+    Returns the registrable domain of a url, e.g. 'https://m.blog.example.co.uk/x' -> 'example.co.uk'.
+
+    IP addresses and single-label hosts are returned unchanged. Suffixes are looked up in
+    MULTI_PART_SUFFIXES rather than the full Public Suffix List, so hosts under a suffix that
+    is missing there (or one with more than two labels) are cut to their last two labels.
+    """
+    host = (urlparse(url if '//' in url else '//' + url).hostname or '').rstrip('.')
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = host.split('.')
+    if len(labels) <= 2:
+        return host
+    if '.'.join(labels[-2:]) in MULTI_PART_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a url used for matching: no scheme, 'www.' or fragment, no trailing
+    slash and no tracking parameters; the remaining query parameters are sorted.
+    """
+    parsed = urlparse(url if '//' in url else '//' + url)
+    host = (parsed.hostname or '').rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parsed.path.rstrip('/')
+    params = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                    if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS)
+    return host + path + ('?' + urlencode(params) if params else '')
 
 
 def find_overlapping_urls(chatgpt_urls, search_urls):
-    def get_domain(url):
-        return urlparse(url).netloc.lower()
-    
-    chatgpt_domains = set(get_domain(url) for url in chatgpt_urls)
-    search_domains = set(get_domain(url) for url in search_urls)
-    
+    chatgpt_domains = set(registrable_domain(url) for url in chatgpt_urls)
+    search_domains = set(registrable_domain(url) for url in search_urls)
+
     overlapping_domains = chatgpt_domains & search_domains
-    
+
     matches = []
     for url in chatgpt_urls:
-        domain = get_domain(url)
+        domain = registrable_domain(url)
         if domain in overlapping_domains:
             matches.append(url)
 
 
     return matches, search_urls
-    
+
+
+class OverlapIndex:
+    """
+    Index of ranked url lists per (query, source), e.g. the urls cited by ChatGPT and the
+    urls ranked by Google for every query of the query log.
+
+    Urls are normalized once when added. `domain_index` and `url_index` map every
+    registrable domain and canonical url to the postings it was seen in, and the
+    overlap and rank correlation reports are computed with joins over all queries at once.
+    """
+
+    def __init__(self):
+        self.domain_index: Dict[str, List[Posting]] = defaultdict(list)
+        self.url_index: Dict[str, List[Posting]] = defaultdict(list)
+        self._rows: List[Tuple[str, str, int, str, str]] = []
+        self._frame: Optional['pd.DataFrame'] = None
+
+    def add(self, query: str, source: str, urls: Iterable[str]):
+        """Adds the ranked urls returned by `source` for `query`."""
+        for rank, url in enumerate(urls, start=1):
+            domain, canonical = registrable_domain(url), canonical_url(url)
+            posting = Posting(query, source, rank)
+            self.domain_index[domain].append(posting)
+            self.url_index[canonical].append(posting)
+            self._rows.append((query, source, rank, domain, canonical))
+        self._frame = None
+
+    def add_many(self, source: str, urls_per_query: Dict[str, Iterable[str]]):
+        for query, urls in urls_per_query.items():
+            self.add(query, source, urls)
+
+    def lookup_domain(self, url_or_domain: str) -> List[Posting]:
+        return list(self.domain_index.get(registrable_domain(url_or_domain), []))
+
+    def lookup_url(self, url: str) -> List[Posting]:
+        return list(self.url_index.get(canonical_url(url), []))
+
+    @property
+    def sources(self) -> List[str]:
+        return sorted({row[1] for row in self._rows})
+
+    @property
+    def frame(self) -> 'pd.DataFrame':
+        """All postings as a DataFrame with columns query, source, rank, domain, url."""
+        if self._frame is None:
+            import pandas as pd
+
+            self._frame = pd.DataFrame(self._rows, columns=['query', 'source', 'rank', 'domain', 'url'])
+        return self._frame
+
+    def _items(self, source: str, level: str) -> 'pd.DataFrame':
+        """Best rank of every distinct item per query for one source."""
+        if level not in ('domain', 'url'):
+            raise ValueError(f"level must be 'domain' or 'url', got '{level}'")
+        df = self.frame[self.frame['source'] == source]
+        return df.groupby(['query', level], sort=False, as_index=False)['rank'].min()
+
+    def overlap(self, source_a: str, source_b: str, level: str = 'domain') -> 'pd.DataFrame':
+        """
+        Per query overlap between two sources.
+
+        Returns:
+            pd.DataFrame: Indexed by query (queries seen by both sources) with columns
+            n_a, n_b, intersection and jaccard.
+        """
+        import pandas as pd
+
+        a, b = self._items(source_a, level), self._items(source_b, level)
+        n_a = a.groupby('query').size()
+        n_b = b.groupby('query').size()
+        shared = a.merge(b, on=['query', level]).groupby('query').size()
+
+        report = pd.concat({'n_a': n_a, 'n_b': n_b}, axis=1, join='inner')
+        report['intersection'] = shared.reindex(report.index, fill_value=0)
+        report['jaccard'] = report['intersection'] / (report['n_a'] + report['n_b'] - report['intersection'])
+        return report
+
+    def rank_correlation(self, source_a: str, source_b: str, level: str = 'domain') -> 'pd.DataFrame':
+        """
+        Per query Spearman rank correlation of the items both sources returned.
+
+        Returns:
+            pd.DataFrame: Indexed by query with columns n_shared and spearman
+            (NaN when fewer than two items are shared).
+        """
+        import pandas as pd
+
+        shared = self._items(source_a, level).merge(self._items(source_b, level), on=['query', level], suffixes=('_a', '_b'))
+        grouped = shared.groupby('query')
+        d = grouped['rank_a'].rank() - grouped['rank_b'].rank()
+
+        report = pd.DataFrame({'n_shared': grouped.size()})
+        sum_d2 = (d ** 2).groupby(shared['query']).sum()
+        n_q = report['n_shared']
+        report['spearman'] = (1 - 6 * sum_d2 / (n_q * (n_q ** 2 - 1))).where(n_q > 1)
+        return report
+
+    def report(self, level: str = 'domain') -> 'pd.DataFrame':
+        """Mean overlap and rank correlation over all queries for every pair of sources."""
+        import pandas as pd
+
+        rows = []
+        for source_a, source_b in combinations(self.sources, 2):
+            overlap = self.overlap(source_a, source_b, level)
+            correlation = self.rank_correlation(source_a, source_b, level)
+            rows.append({
+                'source_a': source_a,
+                'source_b': source_b,
+                'queries': len(overlap),
+                'mean_intersection': round(float(overlap['intersection'].mean()), 2) if len(overlap) else 0.0,
+                'mean_jaccard': round(float(overlap['jaccard'].mean()), 2) if len(overlap) else 0.0,
+                'share_any_overlap': round(float((overlap['intersection'] > 0).mean()), 2) if len(overlap) else 0.0,
+                'mean_spearman': round(float(correlation['spearman'].mean()), 2) if correlation['spearman'].notna().any() else float('nan'),
+            })
+        return pd.DataFrame(rows)
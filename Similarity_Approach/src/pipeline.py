@@ -1,13 +1,15 @@
 import os
 import json
+from functools import lru_cache
 from Similarity_Approach.src.reader import read_webpages
 from Similarity_Approach.src.search_normal import perform_search
 from Similarity_Approach.src.embedding import get_jina_embeddings
 from Similarity_Approach.src.similarity import get_cosine_similarities
-from search.google import get_ranked_urls
+from search.google import GoogleSearchEngine
+from search.bing import BingSearchEngine
+from search.engine import serpapi_backend
 from Similarity_Approach.src.overlap import find_overlapping_urls
-from connector.chatgpt import ChatGPTConnector
-from connector.gemini import GeminiConnector
+from instrumentation.profiling import print_profile_summary, profile_stage
 
 def save_json(filepath, data):
     with open(filepath, 'w') as f:
@@ -19,13 +21,23 @@ def load_json(filepath):
             return json.load(f)
     return None
 
-def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
+SEARCH_ENGINES = {
+    'bing': BingSearchEngine,
+    'google': GoogleSearchEngine,
+}
+
+@lru_cache(maxsize=None)
+def _shared_engine(engine, api_key, backend):
+    # One engine per (engine, key, backend), so its result cache outlives a single run
+    return SEARCH_ENGINES[engine](api_key, backend=backend)
+
+def run_pipeline(query, connector, jina_api_key: str, search_api_key: str, search_backend=None):
 
     # Step 1: Search + checkpoint
-    if isinstance(connector, ChatGPTConnector):
+    if connector.provider == 'openai':
         model = 'chatgpt'
         engine = 'bing'
-    elif isinstance(connector, GeminiConnector):
+    elif connector.provider == 'gemini':
         model = 'gemini'
         engine = 'google'
     else:
@@ -36,7 +48,8 @@ def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
     if search_data:
         response, urls, titles = search_data['response'], search_data['urls'], search_data.get('titles', [])
     else:
-        response, urls, titles = perform_search(query, connector, search=True)
+        with profile_stage('llm_search'):
+            response, urls, titles = perform_search(query, connector, search=True)
         save_json(search_file, {'response': response, 'urls': urls, 'titles': titles})
     print("Step 1: Search completed")
 
@@ -45,7 +58,8 @@ def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
     webpages_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{model}_webpages.json"
     url_contents = load_json(webpages_file)
     if not url_contents:
-        url_contents = read_webpages(urls, jina_api_key)
+        with profile_stage('read_webpages'):
+            url_contents = read_webpages(urls, jina_api_key)
         save_json(webpages_file, url_contents)
     print("Step 2: Read webpages completed")
 
@@ -54,14 +68,16 @@ def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
     doc_embeddings_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{model}_doc_embeddings.json"
     document_embeddings = load_json(doc_embeddings_file)
     if not document_embeddings:
-        document_embeddings = get_jina_embeddings(url_contents, jina_api_key)
-        document_embeddings = [a['embedding'] for emb in document_embeddings for a in emb]
+        with profile_stage('doc_embeddings'):
+            document_embeddings = get_jina_embeddings(url_contents, jina_api_key)
+            document_embeddings = [a['embedding'] for emb in document_embeddings for a in emb]
         save_json(doc_embeddings_file, document_embeddings)
 
     query_embedding_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{model}_query_embedding.json"
     query_embedding = load_json(query_embedding_file)
     if not query_embedding:
-        query_embedding = get_jina_embeddings([query], jina_api_key)[0]['embedding']
+        with profile_stage('query_embedding'):
+            query_embedding = get_jina_embeddings([query], jina_api_key)[0]['embedding']
         save_json(query_embedding_file, query_embedding)
     print("Step 3: Embeddings completed")
 
@@ -69,7 +85,8 @@ def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
     similarities_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{model}_similarities.json"
     similarities = load_json(similarities_file)
     if not similarities:
-        similarities = get_cosine_similarities(query_embedding, document_embeddings)
+        with profile_stage('similarities'):
+            similarities = get_cosine_similarities(query_embedding, document_embeddings)
         save_json(similarities_file, similarities)
     print("Step 4: Similarities completed")
 
@@ -77,16 +94,18 @@ def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
     bing_search_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{engine}_search.json"
     search_urls = load_json(bing_search_file)
     if not search_urls:
-        search_urls = get_ranked_urls(query, search_api_key)
-        
+        with profile_stage('engine_search'):
+            search_engine = _shared_engine(engine, search_api_key, search_backend or serpapi_backend)
+            search_urls = [result.url for result in search_engine.search(query)]
         save_json(bing_search_file, search_urls)
-    print("Step 5: Bing search completed")
+    print(f"Step 5: {engine} search completed")
 
     # Step 6: Read search webpages
     search_webpages_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{engine}_search_webpages.json"
     search_url_contents = load_json(search_webpages_file)
     if not search_url_contents:
-        search_url_contents = read_webpages(search_urls, jina_api_key)
+        with profile_stage('read_search_webpages'):
+            search_url_contents = read_webpages(search_urls, jina_api_key)
         save_json(search_webpages_file, search_url_contents)
     print("Step 6: Read search webpages completed")
 
@@ -94,8 +113,9 @@ def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
     search_doc_embeddings_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{engine}_search_doc_embeddings.json"
     search_document_embeddings = load_json(search_doc_embeddings_file)
     if not search_document_embeddings:
-        search_document_embeddings = get_jina_embeddings(search_url_contents, jina_api_key)
-        search_document_embeddings = [a['embedding'] for emb in search_document_embeddings for a in emb]
+        with profile_stage('search_doc_embeddings'):
+            search_document_embeddings = get_jina_embeddings(search_url_contents, jina_api_key)
+            search_document_embeddings = [a['embedding'] for emb in search_document_embeddings for a in emb]
         save_json(search_doc_embeddings_file, search_document_embeddings)
     print("Step 7: Embeddings completed")
 
@@ -103,8 +123,10 @@ def run_pipeline(query, connector, jina_api_key: str, search_api_key: str):
     search_similarities_file = f"/Users/meet/Documents/Documents/thesis/new code/Similarity_Approach/checkpoints/{engine}_search_similarities.json"
     search_similarities = load_json(search_similarities_file)
     if not search_similarities:
-        search_similarities = get_cosine_similarities(query_embedding, search_document_embeddings)
+        with profile_stage('search_similarities'):
+            search_similarities = get_cosine_similarities(query_embedding, search_document_embeddings)
         save_json(search_similarities_file, search_similarities)
     print("Step 8: Similarities completed")
 
+    print_profile_summary(model)
     return similarities, search_similarities
@@ -1,5 +1,11 @@
+import os
 import requests
 
+from connector.singleflight import single_flight
+
+# Overridable to point the reader at a local stand-in (see jina_stub.py)
+JINA_READER_URL = os.environ.get('JINA_READER_URL', 'https://r.jina.ai/')
+
 def read_webpages(urls: list[str], jina_api_key: str) -> list[str]:
     """
     Reads the content of web pages given their URLs.
@@ -18,8 +24,10 @@ def read_webpages(urls: list[str], jina_api_key: str) -> list[str]:
 
 
 
+# Concurrent requests for the same input share one HTTP request
+@single_flight('jina_reader')
 def retrieve_markdown(url: str, jina_api_key: str):
-    modified_url = 'https://r.jina.ai/{url}'
+    modified_url = JINA_READER_URL + '{url}'
     headers = {
         'Authorization': f'Bearer {jina_api_key}',
         "X-Retain-Images": "none",
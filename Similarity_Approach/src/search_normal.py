@@ -1,9 +1,4 @@
-from sympy import re
-from connector.chatgpt import ChatGPTConnector
-import connector.connector as Connector
-from typing import List
-
-from connector.gemini import GeminiConnector
+from connector.connector import Connector
 
 
 def perform_search( query: str, connector: Connector, temp=0, top_p=1, search=False):
@@ -13,14 +8,14 @@ def perform_search( query: str, connector: Connector, temp=0, top_p=1, search=Fa
     # Call the provided connector
     try:
         response = connector.call(system_prompt, query, temp, top_p, search)
-        if isinstance(connector, GeminiConnector):
+        if connector.provider == 'gemini':
             print(response)
             text = response.candidates[0].content.parts[0].text
             if search:
                 uri = [chunk.web.uri for chunk in response.candidates[0].grounding_metadata.grounding_chunks]
                 titles = [chunk.web.title for chunk in response.candidates[0].grounding_metadata.grounding_chunks]
             return text, uri, titles
-        elif isinstance(connector, ChatGPTConnector):
+        elif connector.provider == 'openai':
             content = response.choices[0].message.content if response else None
             urls = [annotation.url_citation.url for annotation in response.choices[0].message.annotations] if response else []
             titles = [annotation.title for annotation in response.choices[0].message.annotations] if response else []
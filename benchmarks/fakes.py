@@ -0,0 +1,73 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from connector.connector import Connector
+
+
+_SOURCE = re.compile(r"### Source (\d+):\n(.*?)(?=\n### Source \d+:|\Z)", re.S)
+
+
+def _tokens(text):
+    # Rough count, about four characters per token
+    return len(text) // 4
+
+
+def _response(texts, prompt_tokens=0, cached_tokens=None):
+    choices = [SimpleNamespace(message=SimpleNamespace(content=text, annotations=[])) for text in texts]
+    details = SimpleNamespace(cached_tokens=cached_tokens) if cached_tokens is not None else None
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=0, prompt_tokens_details=details)
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeConnector(Connector):
+    """
+    Offline connector for benchmarks. Search prompts are answered with the first
+    sentences of every source followed by its citation, edit prompts with the prompt
+    itself, after an optional fixed `latency` in seconds. With `n` > 1, sample k quotes
+    5 * k fewer words per source, so the samples differ.
+
+    Usage mimics OpenAI prompt caching: the longest prefix shared with one of the last
+    `cache_size` prompts counts as cached once it reaches 1024 tokens, in steps of 128.
+    """
+
+    provider = "openai"
+
+    def __init__(self, model_name="fake", latency=0.0, cache_size=256):
+        super().__init__(model_name)
+        self.latency = latency
+        self._prompts = deque(maxlen=cache_size)
+        self._lock = threading.Lock()
+
+    def _usage(self, system_prompt, user_prompt):
+        prompt = system_prompt + '\n' + user_prompt
+        with self._lock:
+            shared = max((len(os.path.commonprefix([prompt, seen])) for seen in self._prompts), default=0)
+            self._prompts.append(prompt)
+        cached = _tokens(prompt[:shared])
+        return {'prompt_tokens': _tokens(prompt), 'cached_tokens': cached // 128 * 128 if cached >= 1024 else 0}
+
+    def _answer(self, user_prompt, sample=0):
+        sources = _SOURCE.findall(user_prompt)
+        if not sources:
+            return user_prompt
+        sentences = []
+        for idx, text in sources:
+            words = text.split()[:max(5, 40 - 5 * sample)]
+            sentences.append(' '.join(words).rstrip('.') + f' [{idx}].')
+        return ' '.join(sentences)
+
+    def call(self, system_prompt, user_prompt, temp, top_p, n=1, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return _response([self._answer(user_prompt, k) for k in range(n)], **self._usage(system_prompt, user_prompt))
+
+    async def acall(self, system_prompt, user_prompt, temp, top_p, n=1, **kwargs):
+        import asyncio
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return _response([self._answer(user_prompt, k) for k in range(n)], **self._usage(system_prompt, user_prompt))
@@ -0,0 +1,73 @@
+"""
+Import-time regression check of the entry points.
+
+Run from the repository root:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 500
+
+Every entry point is imported in a fresh interpreter with `python -X importtime`. The check
+fails if an import takes longer than the budget, or if it loads one of the heavy modules
+that must only be imported once the stage or connector needing them is used.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ['lexrank', 'nltk', 'scipy', 'tiktoken', 'openai', 'google.genai', 'sympy', 'httpx']
+
+ENTRY_POINTS = [
+    'GEO_new_methods.src.pipeline',
+    'GEO_new_methods.src.method_eval',
+    'GEO_new_methods.src.evaluator',
+    'connector.chatgpt',
+    'connector.gemini',
+    'Similarity_Approach.src.pipeline',
+]
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(module):
+    """Imports `module` in a fresh interpreter, returns (cumulative microseconds, loaded module names)."""
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match and match.group(4) == module:
+            cumulative = int(match.group(2))
+    return cumulative, set(result.stdout.split())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=800.0, help="maximum import time per entry point")
+    parser.add_argument('--repeat', type=int, default=3, help="imports per entry point, the fastest counts")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'entry point':<36} {'import ms':>10}  heavy modules loaded")
+    for module in ENTRY_POINTS:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        micros = min(r[0] for r in runs)
+        loaded = runs[0][1]
+        heavy = [h for h in HEAVY if h in loaded]
+        print(f"{module:<36} {micros / 1000:>10.1f}  {', '.join(heavy) or '-'}")
+        if micros / 1000 > args.budget_ms:
+            failures.append(f"{module} took {micros / 1000:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)} eagerly")
+
+    if failures:
+        print('\n' + '\n'.join(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
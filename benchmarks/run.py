@@ -0,0 +1,235 @@
+"""
+Benchmarks of the evaluation and parsing hot paths on the bundled data.
+
+Run from the repository root:
+
+    python -m benchmarks.run                    # run and compare against benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline    # run and store the results as the new baseline
+    python -m benchmarks.run --only parse_dataset summarize_differences
+
+Every benchmark reports the median time per run, throughput in rows/s and the peak
+traced memory of a single run. With a baseline, runs slower than `--tolerance` fail.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GEO_DIR = os.path.join(ROOT, 'GEO_new_methods')
+DATA_DIR = os.path.join(GEO_DIR, 'data')
+CHECKPOINT_DIR = os.path.join(ROOT, 'Similarity_Approach', 'checkpoints')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark whose optional data is not available here."""
+
+
+def benchmark(fn):
+    """Registers a benchmark. The function does the setup and returns (timed_callable, rows_per_run)."""
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def load_method_frames():
+    """All bundled method_*.csv files, unparsed, concatenated."""
+    frames = [pd.read_csv(path) for path in sorted(glob.glob(os.path.join(DATA_DIR, 'method_*.csv')))]
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_parsed_frames():
+    from GEO_new_methods.src.database import parse_dataset, parse_text_to_list
+
+    df = parse_dataset(load_method_frames())
+    df['evaluation_results_new'] = df['evaluation_results_new'].apply(parse_text_to_list)
+    # Not every bundled method stores its differences, recompute them for all rows
+    return df.drop(columns=['evaluation_diff'])
+
+
+def require_punkt():
+    import nltk
+
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        raise SkipBenchmark("nltk 'punkt_tab' data is missing, run nltk.download('punkt_tab')")
+
+
+@benchmark
+def parse_dataset():
+    from GEO_new_methods.src.database import parse_dataset as parse
+
+    raw = load_method_frames()
+    return (lambda: parse(raw.copy())), len(raw)
+
+
+@benchmark
+def batch_evaluate_diff():
+    from GEO_new_methods.src.method_eval import batch_evaluate_diff as diff
+
+    df = load_parsed_frames()
+    return (lambda: diff(df, strict=False)), len(df)
+
+
+@benchmark
+def summarize_differences():
+    from GEO_new_methods.src.method_eval import batch_evaluate_diff as diff, summarize_differences as summarize
+
+    df = diff(load_parsed_frames(), strict=False)
+    return (lambda: summarize(df)), len(df)
+
+
+@benchmark
+def evaluate():
+    from GEO_new_methods.src.evaluator import evaluate as evaluate_response
+
+    require_punkt()
+    df = load_parsed_frames()
+    pairs = list(zip(df['response_new'], df['cleaned_sources']))
+
+    def run():
+        for response, sources in pairs:
+            evaluate_response(response, sources)
+    return run, len(pairs)
+
+
+@benchmark
+def cosine_similarities():
+    from Similarity_Approach.src.similarity import get_cosine_similarities
+
+    with open(os.path.join(CHECKPOINT_DIR, 'query_embedding.json')) as f:
+        query_embedding = json.load(f)
+    documents = []
+    for path in sorted(glob.glob(os.path.join(CHECKPOINT_DIR, '*doc_embeddings.json'))):
+        with open(path) as f:
+            documents.extend(json.load(f))
+    # Repeat the bundled embeddings to get a measurable run
+    documents = documents * 50
+    return (lambda: get_cosine_similarities(query_embedding, documents)), len(documents)
+
+
+@benchmark
+def run_method():
+    from benchmarks.fakes import FakeConnector
+    from GEO_new_methods.src.pipeline import run_method as run
+
+    require_punkt()
+    raw = load_method_frames()
+    connector = FakeConnector()
+
+    def run_once():
+        # Prompt paths in the editor and search are relative to GEO_new_methods
+        cwd = os.getcwd()
+        os.chdir(GEO_DIR)
+        try:
+            run(raw.copy(), method='summary', connector=connector, batch_size=len(raw), batch_timeout=None,
+                edit_prompt="{section}\n\n\n  {source} ", cumulative=True, save_intermediate=False)
+        finally:
+            os.chdir(cwd)
+    return run_once, len(raw)
+
+
+def measure(name, repeat):
+    fn, rows = BENCHMARKS[name]()
+    fn()  # warm up imports and caches
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        'rows': rows,
+        'median_s': round(median, 6),
+        'min_s': round(min(times), 6),
+        'rows_per_s': round(rows / median, 2) if median > 0 else None,
+        'peak_mib': round(peak / 2**20, 3),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change against the baseline, returns the names of regressed benchmarks."""
+    regressions = []
+    print(f"\n{'benchmark':<24} {'baseline s':>11} {'current s':>11} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'median_s' not in result or 'median_s' not in base:
+            continue
+        change = result['median_s'] / base['median_s'] - 1 if base['median_s'] else 0.0
+        flag = '  REGRESSION' if change > tolerance else ''
+        print(f"{name:<24} {base['median_s']:>11.4f} {result['median_s']:>11.4f} {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    # Measure the scoring itself, not lookups of earlier runs
+    from GEO_new_methods.src.eval_cache import configure_eval_cache
+    configure_eval_cache('off')
+
+    results = {}
+    print(f"{'benchmark':<24} {'rows':>6} {'median s':>10} {'rows/s':>11} {'peak MiB':>9}")
+    for name in args.only or BENCHMARKS:
+        try:
+            result = measure(name, args.repeat)
+        except SkipBenchmark as e:
+            results[name] = {'skipped': str(e)}
+            print(f"{name:<24} skipped ({e})")
+            continue
+        except Exception as e:
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+            print(f"{name:<24} ERROR ({results[name]['error']})")
+            continue
+        results[name] = result
+        print(f"{name:<24} {result['rows']:>6d} {result['median_s']:>10.4f} {result['rows_per_s']:>11.1f} {result['peak_mib']:>9.2f}")
+
+    failed = [name for name, result in results.items() if 'error' in result]
+    if failed:
+        print(f"\nFailed: {', '.join(failed)}")
+        if args.save_baseline:
+            print("Baseline not saved")
+        return 1
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nSlower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
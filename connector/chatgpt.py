@@ -1,29 +1,45 @@
-from openai import OpenAI
 from connector.connector import Connector
+from instrumentation.metrics import instrumented
+from connector.transport import DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT, shared_transport
 import configparser
 
 
 
 class ChatGPTConnector(Connector):
-    def __init__(self, model_name):
-        super().__init__(model_name)
+
+    provider = "openai"
+
+    def __init__(self, model_name, timeout=DEFAULT_TIMEOUT, max_connections=DEFAULT_MAX_CONNECTIONS, api_key=None):
+        super().__init__(model_name, timeout=timeout, max_connections=max_connections)
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
+
         # Load config
         config = configparser.ConfigParser()
         config.read('config.ini')
 
         # Debug: Print the key (first few characters only for security)
-        openai_key = config['API_KEYS']['openai_api_key']
-        self.client = OpenAI(api_key=openai_key)
+        # An explicit key (e.g. one of several behind a RoutingConnector) overrides config.ini
+        openai_key = api_key or config['API_KEYS']['openai_api_key']
+        self.client = OpenAI(api_key=openai_key, timeout=timeout)
+        self.async_client = AsyncOpenAI(
+            api_key=openai_key,
+            timeout=timeout,
+            http_client=DefaultAsyncHttpxClient(transport=shared_transport(max_connections), timeout=timeout),
+        )
 
-    def call(self, system_prompt, user_prompt, temp, top_p, search = False):
+    def _request(self, system_prompt, user_prompt, temp, top_p, search, n=1):
+        request = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+        }
+        if n > 1:
+            # n completions of one prompt, billed for the prompt once
+            request["n"] = n
         if search:
-            response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages= [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-                ],
-            web_search_options={
+            request["web_search_options"] = {
                 "user_location": {
                 "type": "approximate",
                 "approximate": {
@@ -32,17 +48,34 @@ class ChatGPTConnector(Connector):
                     "region": "Baden-Württemberg",
                 }
                 },
-            },
-            )
-            return response
+            }
         else:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages= [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-                    ],
-                temperature=temp,
-                top_p=top_p
-            )
-            return response
+            request["temperature"] = temp
+            request["top_p"] = top_p
+        return request
+
+    @instrumented
+    def call(self, system_prompt, user_prompt, temp, top_p, search = False, n = 1):
+        return self.client.chat.completions.create(**self._request(system_prompt, user_prompt, temp, top_p, search, n))
+
+    @instrumented
+    async def acall(self, system_prompt, user_prompt, temp, top_p, search = False, n = 1):
+        return await self.async_client.chat.completions.create(**self._request(system_prompt, user_prompt, temp, top_p, search, n))
+
+    def _stream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        stream = self.client.chat.completions.create(**self._request(system_prompt, user_prompt, temp, top_p, False), stream=True)
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+
+    async def _astream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        stream = await self.async_client.chat.completions.create(**self._request(system_prompt, user_prompt, temp, top_p, False), stream=True)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
@@ -1,13 +1,44 @@
 from abc import ABC, abstractmethod
+from connector.transport import DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT
+from connector.streaming import AsyncGenerationStream, GenerationStream
+from instrumentation.metrics import record_stream
 
 
 class Connector(ABC):
     """Abstract base class (interface) for API connectors"""
-    
-    def __init__(self, model_name):
+
+    provider = None
+
+    def __init__(self, model_name, timeout=DEFAULT_TIMEOUT, max_connections=DEFAULT_MAX_CONNECTIONS):
         self.model_name = model_name
+        self.timeout = timeout
+        self.max_connections = max_connections
 
     @abstractmethod
     def call(self, system_prompt, user_prompt, temp, top_p) -> None | object:
         """Abstract method for making API calls"""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    async def acall(self, system_prompt, user_prompt, temp, top_p) -> None | object:
+        """Abstract method for making API calls without blocking the event loop"""
+        pass
+
+    def stream(self, system_prompt, user_prompt, temp, top_p, stop_condition=None) -> GenerationStream:
+        """Streams the completion, see GenerationStream for the recorded timings and early stopping"""
+        return GenerationStream(self._stream_chunks(system_prompt, user_prompt, temp, top_p), stop_condition, on_complete=self._record_stream)
+
+    def astream(self, system_prompt, user_prompt, temp, top_p, stop_condition=None) -> AsyncGenerationStream:
+        """Async counterpart of stream, iterate the result with `async for`"""
+        return AsyncGenerationStream(self._astream_chunks(system_prompt, user_prompt, temp, top_p), stop_condition, on_complete=self._record_stream)
+
+    def _record_stream(self, stream):
+        record_stream(self, stream)
+
+    def _stream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        """Generator of text chunks, implemented by connectors that support streaming"""
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+
+    async def _astream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+        yield
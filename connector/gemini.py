@@ -1,50 +1,103 @@
-from google import genai
-from google.genai import types
+from connector.connector import Connector
+from instrumentation.metrics import instrumented
+from connector.transport import DEFAULT_MAX_CONNECTIONS, DEFAULT_TIMEOUT, shared_transport
 import configparser
 
-class GeminiConnector:
-    def __init__(self, model_name):
-        self.model_name = model_name
+class GeminiConnector(Connector):
+
+    provider = "gemini"
+
+    def __init__(self, model_name, timeout=DEFAULT_TIMEOUT, max_connections=DEFAULT_MAX_CONNECTIONS, api_key=None):
+        super().__init__(model_name, timeout=timeout, max_connections=max_connections)
+        from google import genai
+        from google.genai import types
 
         # Load config
         config = configparser.ConfigParser()
         config.read('config.ini')
 
         # Debug: Print part of the API key for verification (optional)
-        gemini_api_key = config['API_KEYS']['gemini_api_key']
+        # An explicit key (e.g. one of several behind a RoutingConnector) overrides config.ini
+        gemini_api_key = api_key or config['API_KEYS']['gemini_api_key']
 
-        # Initialize Gemini client
-        self.client = genai.Client(api_key=gemini_api_key)
+        # Initialize Gemini client, async calls (client.aio) share the connector connection pool
+        self.client = genai.Client(
+            api_key=gemini_api_key,
+            http_options=types.HttpOptions(
+                timeout=int(timeout * 1000),
+                async_client_args={'transport': shared_transport(max_connections)},
+            ),
+        )
 
         # Define grounding tool (Google Search)
         self.grounding_tool = types.Tool(
             google_search=types.GoogleSearch()
         )
 
-    def call(self, system_prompt, user_prompt, temp, top_p, search=False):
+    def _config(self, system_prompt, temp, top_p, search, n=1):
+        from google.genai import types
 
-        # Configure generation settings
+        # Configure generation settings, n > 1 asks for several candidates of one prompt
+        candidate_count = n if n > 1 else None
         if search:
-            config = types.GenerateContentConfig(
+            return types.GenerateContentConfig(
                 tools=[self.grounding_tool],
                 system_instruction=[system_prompt],
                 temperature=temp,
-                top_p=top_p
-            )
-        else:
-            config = types.GenerateContentConfig(
-                system_instruction=[system_prompt],
-                tools=[],
-                temperature=temp,
-                top_p=top_p
+                top_p=top_p,
+                candidate_count=candidate_count,
             )
+        return types.GenerateContentConfig(
+            system_instruction=[system_prompt],
+            tools=[],
+            temperature=temp,
+            top_p=top_p,
+            candidate_count=candidate_count,
+        )
+
+    @instrumented
+    def call(self, system_prompt, user_prompt, temp, top_p, search=False, n=1):
 
         # Make the generate_content request
         response = self.client.models.generate_content(
             model=self.model_name,
             contents=user_prompt,
-            config=config,
+            config=self._config(system_prompt, temp, top_p, search, n),
         )
 
         # Return the generated text and grounding metadata if any
-        return response
\ No newline at end of file
+        return response
+
+    @instrumented
+    async def acall(self, system_prompt, user_prompt, temp, top_p, search=False, n=1):
+        return await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=user_prompt,
+            config=self._config(system_prompt, temp, top_p, search, n),
+        )
+
+    def _stream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        stream = self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=user_prompt,
+            config=self._config(system_prompt, temp, top_p, False),
+        )
+        try:
+            for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            stream.close()
+
+    async def _astream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=user_prompt,
+            config=self._config(system_prompt, temp, top_p, False),
+        )
+        try:
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            await stream.aclose()
@@ -0,0 +1,123 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from connector.connector import Connector
+from connector.replay import with_search
+from connector.transport import run_async
+from instrumentation.metrics import get_recorder
+
+
+class HedgedConnector(Connector):
+    """
+    Sends a duplicate of a call that runs longer than the `percentile` latency of recent calls,
+    returns whichever finishes first and cancels the other.
+
+    Hedging starts once `min_samples` latencies are known and never fires earlier than
+    `min_delay` seconds. At most `max_extra_ratio` of the calls get a duplicate, which caps
+    the extra spend (0.05 means at most 5% more requests). Synchronous `call`s run on the
+    connector event loop, so the losing request is cancelled there as well.
+
+    Counters on the metrics recorder, labelled by model: `hedge_fired`, `hedge_won` (the
+    duplicate finished first), `hedge_skipped` (over the spend cap).
+
+        connector = HedgedConnector(ChatGPTConnector("gpt-4o-search-preview"), percentile=90)
+    """
+
+    def __init__(self, connector: Connector, percentile: float = 95.0, window: int = 200, min_samples: int = 20,
+                 min_delay: float = 1.0, max_extra_ratio: float = 0.05):
+        super().__init__(connector.model_name, timeout=connector.timeout, max_connections=connector.max_connections)
+        self.connector = connector
+        self.provider = connector.provider
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_extra_ratio = max_extra_ratio
+        self.calls = 0
+        self.hedges = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a call gets a duplicate, None while too few latencies are known."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = max(0, math.ceil(self.percentile / 100 * len(latencies)) - 1)
+        return max(self.min_delay, latencies[index])
+
+    def _observe(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_extra_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    async def _attempt(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.connector.acall(*args, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled attempt took at least this long, leaving it out would bias the window to fast calls
+            self._observe(time.perf_counter() - start)
+            raise
+        self._observe(time.perf_counter() - start)
+        return response
+
+    async def acall(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        kwargs = with_search(kwargs, search)
+        with self._lock:
+            self.calls += 1
+        args = (system_prompt, user_prompt, temp, top_p)
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._attempt(*args, **kwargs))
+        attempts = [primary]
+        try:
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            recorder = get_recorder()
+            if not self._take_hedge():
+                recorder.increment('hedge_skipped', model=self.model_name)
+                return await primary
+            recorder.increment('hedge_fired', model=self.model_name)
+            hedge = asyncio.ensure_future(self._attempt(*args, **kwargs))
+            attempts.append(hedge)
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            recorder.increment('hedge_won', model=self.model_name)
+                        return task.result()
+            # Both attempts failed, report the original request's error
+            raise primary.exception()
+        finally:
+            # Also when this call itself is cancelled while waiting
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    def call(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        return run_async(self.acall(system_prompt, user_prompt, temp, top_p, search, **kwargs))
+
+    def _stream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        # Streams are not hedged, the first chunk already arrives before a hedge would fire
+        return self.connector._stream_chunks(system_prompt, user_prompt, temp, top_p)
+
+    def _astream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        return self.connector._astream_chunks(system_prompt, user_prompt, temp, top_p)
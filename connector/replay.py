@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from connector.connector import Connector
+from connector.responses import response_text
+from instrumentation.metrics import instrumented
+
+
+# A latency distribution draws a delay in seconds from the given random generator
+# and the latency recorded with the response (None if unknown).
+LatencyDistribution = Callable[[random.Random, Optional[float]], float]
+
+
+def constant(seconds: float) -> LatencyDistribution:
+    return lambda rng, recorded: seconds
+
+
+def uniform(low: float, high: float) -> LatencyDistribution:
+    return lambda rng, recorded: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> LatencyDistribution:
+    """Right-skewed latencies around `median`, a few calls take several times longer."""
+    import math
+
+    return lambda rng, recorded: rng.lognormvariate(math.log(median), sigma)
+
+
+def recorded(scale: float = 1.0) -> LatencyDistribution:
+    """The latency measured while recording, multiplied by `scale`."""
+    return lambda rng, latency: (latency or 0.0) * scale
+
+
+def request_key(model_name, system_prompt, user_prompt, temp, top_p, **kwargs) -> str:
+    """Stable hash identifying a connector request."""
+    payload = json.dumps([model_name, system_prompt, user_prompt, temp, top_p, sorted(kwargs.items())], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def with_search(kwargs: dict, search: bool) -> dict:
+    """
+    Call keyword arguments including `search` when it is set. Wrappers take `search` explicitly,
+    callers such as Similarity_Approach pass it positionally. Leaving out the default keeps the
+    request keys of recordings made without it.
+    """
+    return {**kwargs, 'search': search} if search else kwargs
+
+
+def _to_plain(obj):
+    if isinstance(obj, SimpleNamespace):
+        return {k: _to_plain(v) for k, v in vars(obj).items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_plain(v) for v in obj]
+    return obj
+
+
+def _to_namespace(obj):
+    if isinstance(obj, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return [_to_namespace(v) for v in obj]
+    return obj
+
+
+def serialize_response(response) -> dict:
+    if hasattr(response, 'model_dump'):
+        kind = 'openai' if hasattr(response, 'choices') else 'gemini'
+        return {'type': kind, 'data': response.model_dump(mode='json', exclude_none=True)}
+    return {'type': 'namespace', 'data': _to_plain(response)}
+
+
+def deserialize_response(entry: dict):
+    if entry['type'] == 'openai':
+        from openai.types.chat import ChatCompletion
+
+        return ChatCompletion.model_validate(entry['data'])
+    if entry['type'] == 'gemini':
+        from google.genai import types
+
+        return types.GenerateContentResponse.model_validate(entry['data'])
+    return _to_namespace(entry['data'])
+
+
+class RecordingConnector(Connector):
+    """Passes calls through to `connector` and appends every request/response pair to a JSON-lines file."""
+
+    def __init__(self, connector: Connector, path: str):
+        super().__init__(connector.model_name, timeout=connector.timeout, max_connections=connector.max_connections)
+        self.connector = connector
+        self.provider = connector.provider
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, args, kwargs, response, latency):
+        entry = {
+            'key': request_key(self.model_name, *args, **kwargs),
+            'model': self.model_name,
+            'provider': self.provider,
+            'latency': latency,
+            'response': serialize_response(response),
+        }
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def call(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        kwargs = with_search(kwargs, search)
+        start = time.perf_counter()
+        response = self.connector.call(system_prompt, user_prompt, temp, top_p, **kwargs)
+        self._write((system_prompt, user_prompt, temp, top_p), kwargs, response, time.perf_counter() - start)
+        return response
+
+    async def acall(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        kwargs = with_search(kwargs, search)
+        start = time.perf_counter()
+        response = await self.connector.acall(system_prompt, user_prompt, temp, top_p, **kwargs)
+        self._write((system_prompt, user_prompt, temp, top_p), kwargs, response, time.perf_counter() - start)
+        return response
+
+
+class ReplayConnector(Connector):
+    """
+    Answers calls from a file written by RecordingConnector, without network access.
+
+    Every request is delayed by a draw from `latency` (the recorded latency by default), and
+    fails with a provider rate-limit error with probability `rate_limit_rate` or a server
+    error with probability `error_rate`. Draws are seeded by (`seed`, request, repetition),
+    so a replay behaves the same regardless of call order or concurrency.
+    """
+
+    def __init__(self, path: str, model_name: Optional[str] = None, latency: Optional[LatencyDistribution] = None,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0, strict: bool = True):
+        self.entries = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault(entry['key'], []).append(entry)
+        first = next(iter(self.entries.values()), [{}])[0]
+        super().__init__(model_name or first.get('model', 'replay'))
+        self.provider = first.get('provider')
+        self.latency = latency or recorded()
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self.strict = strict
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, args, kwargs):
+        key = request_key(self.model_name, *args, **kwargs)
+        entries = self.entries.get(key)
+        if not entries:
+            if self.strict:
+                raise KeyError(f"No recorded response for request {key[:12]}")
+            entries = [{'latency': 0.0, 'response': {'type': 'namespace', 'data': {'choices': [{'message': {'content': ''}}]}}}]
+        with self._lock:
+            n = self._seen.get(key, 0)
+            self._seen[key] = n + 1
+        # Repeated identical requests cycle through the recorded responses
+        entry = entries[n % len(entries)]
+        rng = random.Random(f"{self.seed}:{key}:{n}")
+        return entry, rng
+
+    def _failure(self, rng):
+        draw = rng.random()
+        if draw < self.rate_limit_rate:
+            return self._error(429)
+        if draw < self.rate_limit_rate + self.error_rate:
+            return self._error(503)
+        return None
+
+    def _error(self, status):
+        message = "Rate limit reached (replay)" if status == 429 else "Service unavailable (replay)"
+        if self.provider == 'gemini':
+            from google.genai import errors
+
+            cls = errors.ClientError if status < 500 else errors.ServerError
+            return cls(status, {'error': {'code': status, 'message': message}})
+
+        import httpx
+        import openai
+
+        response = httpx.Response(status, request=httpx.Request('POST', 'https://replay.local/v1/chat/completions'))
+        cls = openai.RateLimitError if status == 429 else openai.InternalServerError
+        return cls(message, response=response, body=None)
+
+    @instrumented
+    def call(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        entry, rng = self._lookup((system_prompt, user_prompt, temp, top_p), with_search(kwargs, search))
+        time.sleep(self.latency(rng, entry.get('latency')))
+        error = self._failure(rng)
+        if error is not None:
+            raise error
+        return deserialize_response(entry['response'])
+
+    @instrumented
+    async def acall(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        entry, rng = self._lookup((system_prompt, user_prompt, temp, top_p), with_search(kwargs, search))
+        await asyncio.sleep(self.latency(rng, entry.get('latency')))
+        error = self._failure(rng)
+        if error is not None:
+            raise error
+        return deserialize_response(entry['response'])
+
+    def _chunks(self, system_prompt, user_prompt, temp, top_p):
+        """Recorded text split into words, with 20% of the latency before the first chunk."""
+        entry, rng = self._lookup((system_prompt, user_prompt, temp, top_p), {})
+        latency = self.latency(rng, entry.get('latency'))
+        error = self._failure(rng)
+        words = (response_text(deserialize_response(entry['response'])) or '').split(' ')
+        delays = [0.2 * latency] + [0.8 * latency / len(words)] * (len(words) - 1)
+        return error, list(zip(delays, [w + ' ' for w in words[:-1]] + words[-1:]))
+
+    def _stream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        error, chunks = self._chunks(system_prompt, user_prompt, temp, top_p)
+        if error is not None:
+            raise error
+        for delay, chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+
+    async def _astream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        error, chunks = self._chunks(system_prompt, user_prompt, temp, top_p)
+        if error is not None:
+            raise error
+        for delay, chunk in chunks:
+            await asyncio.sleep(delay)
+            yield chunk
@@ -0,0 +1,45 @@
+def response_text(response) -> str | None:
+    """Returns the generated text of an OpenAI or Gemini response."""
+    if hasattr(response, 'choices'):
+        return response.choices[0].message.content
+    if hasattr(response, 'candidates'):
+        return response.text
+    raise TypeError(f"Unsupported response type: {type(response).__name__}")
+
+
+def response_texts(response) -> list:
+    """Returns the text of every choice (OpenAI `n`) or candidate (Gemini `candidate_count`) of a response."""
+    if hasattr(response, 'choices'):
+        return [choice.message.content for choice in response.choices]
+    if hasattr(response, 'candidates'):
+        texts = []
+        for candidate in response.candidates or []:
+            parts = candidate.content.parts if candidate.content and candidate.content.parts else []
+            texts.append(''.join(part.text for part in parts if getattr(part, 'text', None)))
+        return texts
+    raise TypeError(f"Unsupported response type: {type(response).__name__}")
+
+
+def response_usage(response) -> dict:
+    """
+    Token usage of an OpenAI or Gemini response.
+
+    Returns:
+        dict: prompt_tokens, completion_tokens and cached_tokens (None when the provider did not report them).
+    """
+    usage = {'prompt_tokens': None, 'completion_tokens': None, 'cached_tokens': None}
+
+    openai_usage = getattr(response, 'usage', None)
+    if openai_usage is not None:
+        usage['prompt_tokens'] = openai_usage.prompt_tokens
+        usage['completion_tokens'] = openai_usage.completion_tokens
+        details = getattr(openai_usage, 'prompt_tokens_details', None)
+        usage['cached_tokens'] = getattr(details, 'cached_tokens', None) if details is not None else None
+        return usage
+
+    gemini_usage = getattr(response, 'usage_metadata', None)
+    if gemini_usage is not None:
+        usage['prompt_tokens'] = gemini_usage.prompt_token_count
+        usage['completion_tokens'] = gemini_usage.candidates_token_count
+        usage['cached_tokens'] = gemini_usage.cached_content_token_count
+    return usage
@@ -0,0 +1,340 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+from connector.connector import Connector
+from connector.replay import with_search
+from instrumentation.metrics import get_recorder, retrying
+
+# Client errors that every backend would return for the same request
+NON_RETRYABLE_STATUS = {400, 404, 422}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    # openai errors carry `status_code`, google-genai errors `code`
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    return _status_code(error) not in NON_RETRYABLE_STATUS
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for `reset_timeout`
+    seconds. Then a single probe call is let through: success closes the breaker, failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def available(self) -> bool:
+        state = self.state
+        return state == 'closed' or (state == 'half_open' and not self._probing)
+
+    def acquire(self):
+        if self.state == 'half_open':
+            self._probing = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+@dataclass
+class Backend:
+    """
+    One connector behind a RoutingConnector.
+
+    Args:
+        connector: The connector, e.g. a ChatGPTConnector with its own API key.
+        weight: Relative share of the traffic at equal latency.
+        group: Backends of the same group serve equivalent models; a RoutingConnector only
+            calls, and fails over between, the backends of its group. Defaults to the
+            connector's model name.
+        requests_per_minute: Quota of the key or deployment, None for no limit.
+        name: Label in metrics and `status()`, defaults to the model name.
+    """
+    connector: Connector
+    weight: float = 1.0
+    group: Optional[str] = None
+    requests_per_minute: Optional[int] = None
+    name: Optional[str] = None
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    latency: Optional[float] = None
+    in_flight: int = 0
+    _sent: deque = field(default_factory=deque, repr=False)
+
+    def __post_init__(self):
+        self.group = self.group or self.connector.model_name
+        self.name = self.name or self.connector.model_name
+
+    def quota_left(self, now: float) -> Optional[int]:
+        if self.requests_per_minute is None:
+            return None
+        while self._sent and now - self._sent[0] >= 60.0:
+            self._sent.popleft()
+        return self.requests_per_minute - len(self._sent)
+
+    def quota_wait(self, now: float) -> float:
+        """Seconds until the quota allows the next request."""
+        left = self.quota_left(now)
+        if left is None or left > 0:
+            return 0.0
+        return 60.0 - (now - self._sent[0])
+
+    def score(self, now: float, prior_latency: float = 1.0) -> float:
+        """Expected cost of sending the next request here, lower is better. `prior_latency` stands in until a call was measured."""
+        latency = self.latency if self.latency is not None else prior_latency
+        score = latency * (self.in_flight + 1) / self.weight
+        left = self.quota_left(now)
+        if left is not None:
+            score /= max(left, 1) / self.requests_per_minute
+        return score
+
+
+class RoutingConnector(Connector):
+    """
+    Spreads calls over several connectors (API keys, deployments, providers).
+
+    Calls only go to the backends of one group, by default the group of the first backend.
+    Each call goes to the available backend with the lowest latency estimate (exponentially
+    weighted, times the calls it has in flight, divided by its weight and remaining quota);
+    unmeasured backends are assumed to be as fast as the mean of the measured ones (1 second
+    before any call completed). Backends whose circuit breaker is open are skipped. A failed
+    call is retried on another backend, up to `max_attempts` attempts; retries show up in the
+    call metrics and as `router_failover`.
+
+        connector = RoutingConnector([
+            Backend(ChatGPTConnector("gpt-4o-search-preview"), requests_per_minute=500, name="key-1"),
+            Backend(ChatGPTConnector("gpt-4o-search-preview", api_key=second_key), name="key-2"),
+            Backend(GeminiConnector("gemini-2.5-flash"), weight=0.5, group="gpt-4o-search-preview"),
+        ])
+    """
+
+    def __init__(self, backends: Sequence[Backend], max_attempts: int = 3, smoothing: float = 0.2, group: Optional[str] = None):
+        if not backends:
+            raise ValueError("RoutingConnector needs at least one backend")
+        self.backends: List[Backend] = list(backends)
+        self.group = group or self.backends[0].group
+        members = [b for b in self.backends if b.group == self.group]
+        if not members:
+            raise ValueError(f"RoutingConnector has no backend in group {self.group}")
+        first = members[0].connector
+        super().__init__(first.model_name, timeout=first.timeout, max_connections=first.max_connections)
+        providers = {b.connector.provider for b in members}
+        self.provider = providers.pop() if len(providers) == 1 else None
+        self.max_attempts = max_attempts
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    def _select(self, tried: set):
+        """Reserves the best backend, returns (backend, 0) or (None, seconds to wait for quota)."""
+        now = time.monotonic()
+        with self._lock:
+            members = [b for b in self.backends if b.group == self.group]
+            candidates = [b for b in members if id(b) not in tried and b.breaker.available()]
+            if not candidates:
+                return None, None
+            ready = [b for b in candidates if b.quota_wait(now) <= 0]
+            if not ready:
+                return None, min(b.quota_wait(now) for b in candidates)
+            # Unmeasured backends share the load by in-flight calls and weight like the others
+            measured = [b.latency for b in members if b.latency is not None]
+            prior = sum(measured) / len(measured) if measured else 1.0
+            backend = min(ready, key=lambda b: b.score(now, prior))
+            backend.breaker.acquire()
+            backend.in_flight += 1
+            if backend.requests_per_minute is not None:
+                backend._sent.append(now)
+            return backend, 0.0
+
+    def _finish(self, backend: Backend, latency: Optional[float], error: Optional[Exception]):
+        with self._lock:
+            backend.in_flight -= 1
+            if error is not None and is_retryable(error):
+                backend.breaker.record_failure()
+            else:
+                # A rejected request still got an answer from a live backend
+                backend.breaker.record_success()
+            if error is None and latency is not None:
+                if backend.latency is None:
+                    backend.latency = latency
+                else:
+                    backend.latency += self.smoothing * (latency - backend.latency)
+        if error is not None:
+            get_recorder().increment('router_errors', backend=backend.name)
+
+    def _abandon(self, backend: Backend):
+        """Releases a backend whose call was interrupted (cancelled, KeyboardInterrupt) without judging it."""
+        with self._lock:
+            backend.in_flight -= 1
+            backend.breaker._probing = False
+
+    def _no_backend(self):
+        return RuntimeError(f"No available backend in group {self.group} (all open or failed)")
+
+    def call(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        kwargs = with_search(kwargs, search)
+        tried, last_error = set(), None
+        for attempt in range(self.max_attempts):
+            backend, wait = self._select(tried)
+            while backend is None and wait:
+                time.sleep(wait)
+                backend, wait = self._select(tried)
+            if backend is None:
+                break
+            if attempt:
+                get_recorder().increment('router_failover', backend=backend.name)
+            start = time.perf_counter()
+            try:
+                with retrying(attempt):
+                    response = backend.connector.call(system_prompt, user_prompt, temp, top_p, **kwargs)
+            except Exception as e:
+                self._finish(backend, None, e)
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                tried.add(id(backend))
+                continue
+            except BaseException:
+                self._abandon(backend)
+                raise
+            self._finish(backend, time.perf_counter() - start, None)
+            return response
+        raise last_error or self._no_backend()
+
+    async def acall(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        kwargs = with_search(kwargs, search)
+        tried, last_error = set(), None
+        for attempt in range(self.max_attempts):
+            backend, wait = self._select(tried)
+            while backend is None and wait:
+                await asyncio.sleep(wait)
+                backend, wait = self._select(tried)
+            if backend is None:
+                break
+            if attempt:
+                get_recorder().increment('router_failover', backend=backend.name)
+            start = time.perf_counter()
+            try:
+                with retrying(attempt):
+                    response = await backend.connector.acall(system_prompt, user_prompt, temp, top_p, **kwargs)
+            except asyncio.CancelledError:
+                self._abandon(backend)
+                raise
+            except Exception as e:
+                self._finish(backend, None, e)
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                tried.add(id(backend))
+                continue
+            self._finish(backend, time.perf_counter() - start, None)
+            return response
+        raise last_error or self._no_backend()
+
+    def _stream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        # Fails over like `call` until the first chunk arrived, later errors end the stream
+        tried, last_error = set(), None
+        for attempt in range(self.max_attempts):
+            backend, wait = self._select(tried)
+            while backend is None and wait:
+                time.sleep(wait)
+                backend, wait = self._select(tried)
+            if backend is None:
+                break
+            if attempt:
+                get_recorder().increment('router_failover', backend=backend.name)
+            start, started = time.perf_counter(), False
+            try:
+                for chunk in backend.connector._stream_chunks(system_prompt, user_prompt, temp, top_p):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # Closed early by a stop condition, the backend was answering
+                self._finish(backend, None, None)
+                raise
+            except Exception as e:
+                self._finish(backend, None, e)
+                if started or not is_retryable(e):
+                    raise
+                last_error = e
+                tried.add(id(backend))
+                continue
+            except BaseException:
+                self._abandon(backend)
+                raise
+            self._finish(backend, time.perf_counter() - start, None)
+            return
+        raise last_error or self._no_backend()
+
+    async def _astream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        tried, last_error = set(), None
+        for attempt in range(self.max_attempts):
+            backend, wait = self._select(tried)
+            while backend is None and wait:
+                await asyncio.sleep(wait)
+                backend, wait = self._select(tried)
+            if backend is None:
+                break
+            if attempt:
+                get_recorder().increment('router_failover', backend=backend.name)
+            start, started = time.perf_counter(), False
+            try:
+                async for chunk in backend.connector._astream_chunks(system_prompt, user_prompt, temp, top_p):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                self._finish(backend, None, None)
+                raise
+            except asyncio.CancelledError:
+                self._abandon(backend)
+                raise
+            except Exception as e:
+                self._finish(backend, None, e)
+                if started or not is_retryable(e):
+                    raise
+                last_error = e
+                tried.add(id(backend))
+                continue
+            self._finish(backend, time.perf_counter() - start, None)
+            return
+        raise last_error or self._no_backend()
+
+    def status(self) -> List[dict]:
+        """Current state of every backend, for logging."""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'backend': b.name,
+                'group': b.group,
+                'breaker': b.breaker.state,
+                'latency': b.latency,
+                'in_flight': b.in_flight,
+                'quota_left': b.quota_left(now),
+            } for b in self.backends]
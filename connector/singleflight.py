@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import threading
+
+from connector.connector import Connector
+from connector.replay import request_key, with_search
+from instrumentation.metrics import get_recorder
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key onto one execution.
+
+    The first caller of a key runs the function; callers arriving while it is in flight wait
+    and get the same result or exception. Nothing is cached: once the call returns, the next
+    caller of the key runs it again. Shared calls are counted as `singleflight_shared` on the
+    metrics recorder, labelled with `flight=name`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def _shared(self):
+        get_recorder().increment('singleflight_shared', flight=self.name)
+
+    def do(self, key, fn):
+        """Runs `fn()` unless a call with `key` is already in flight, then waits for that one."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._shared()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            # Waiters must not mistake an interrupted call for a None result
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def ado(self, key, coro_fn):
+        """
+        Async counterpart of `do`. A waiter that is cancelled leaves the shared call running
+        for the others; it is cancelled only when its last waiter is.
+        """
+        key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            entry = self._tasks.get(key)
+            if entry is None:
+                task = asyncio.ensure_future(coro_fn())
+                entry = self._tasks[key] = [task, 0]
+                task.add_done_callback(functools.partial(self._forget, key))
+            else:
+                self._shared()
+            entry[1] += 1
+        task = entry[0]
+        try:
+            return await asyncio.shield(task)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                abandoned = entry[1] == 0 and not task.done()
+            if abandoned:
+                task.cancel()
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key, [None])[0] is task:
+                del self._tasks[key]
+
+
+def single_flight(name: str):
+    """Decorates a function so that concurrent calls with equal arguments share one execution."""
+    flight = SingleFlight(name)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return flight.do((args, tuple(sorted(kwargs.items()))), lambda: fn(*args, **kwargs))
+        wrapper.flight = flight
+        return wrapper
+    return decorator
+
+
+class SingleFlightConnector(Connector):
+    """
+    Passes calls through to `connector`, sharing one upstream request between concurrent
+    identical requests (same model, prompts and parameters).
+
+    Wrap it outside of a HedgedConnector, not inside: the hedge duplicate is an identical
+    request and would otherwise be collapsed onto the call it is meant to race. Sampled calls
+    (`temp` above 0 or `n` above 1) are never shared, their callers want independent samples.
+    """
+
+    def __init__(self, connector: Connector):
+        super().__init__(connector.model_name, timeout=connector.timeout, max_connections=connector.max_connections)
+        self.connector = connector
+        self.provider = connector.provider
+        self.flight = SingleFlight(connector.model_name)
+
+    @staticmethod
+    def _sampled(temp, kwargs) -> bool:
+        return (temp or 0) > 0 or kwargs.get('n', 1) > 1
+
+    def call(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        kwargs = with_search(kwargs, search)
+        if self._sampled(temp, kwargs):
+            return self.connector.call(system_prompt, user_prompt, temp, top_p, **kwargs)
+        key = request_key(self.model_name, system_prompt, user_prompt, temp, top_p, **kwargs)
+        return self.flight.do(key, lambda: self.connector.call(system_prompt, user_prompt, temp, top_p, **kwargs))
+
+    async def acall(self, system_prompt, user_prompt, temp, top_p, search=False, **kwargs):
+        kwargs = with_search(kwargs, search)
+        if self._sampled(temp, kwargs):
+            return await self.connector.acall(system_prompt, user_prompt, temp, top_p, **kwargs)
+        key = request_key(self.model_name, system_prompt, user_prompt, temp, top_p, **kwargs)
+        return await self.flight.ado(key, lambda: self.connector.acall(system_prompt, user_prompt, temp, top_p, **kwargs))
+
+    def _stream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        return self.connector._stream_chunks(system_prompt, user_prompt, temp, top_p)
+
+    def _astream_chunks(self, system_prompt, user_prompt, temp, top_p):
+        return self.connector._astream_chunks(system_prompt, user_prompt, temp, top_p)
@@ -0,0 +1,105 @@
+import re
+import time
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+
+StopCondition = Callable[[str], bool]
+
+_SENTENCE_END = re.compile(r"[.!?](?:\s*\[\d+\])*(?=\s|$)")
+_CITATION = re.compile(r"\[\d+\]")
+
+
+def max_sentences(n: int) -> StopCondition:
+    """Stops the stream once the text holds `n` complete sentences (citations after the period count to the sentence)."""
+    def condition(text: str) -> bool:
+        return len(_SENTENCE_END.findall(text)) >= n
+    return condition
+
+
+def max_citations(n: int) -> StopCondition:
+    """Stops the stream once the text holds `n` citation markers like [1]."""
+    def condition(text: str) -> bool:
+        return len(_CITATION.findall(text)) >= n
+    return condition
+
+
+class GenerationStream:
+    """
+    Iterates over the text chunks of a streamed completion.
+
+    Records the time to the first non-empty chunk and the total generation time, both in
+    seconds from the moment the stream is created. If `stop_condition` returns True for the
+    text received so far, the underlying request is closed and iteration ends early.
+    """
+
+    def __init__(self, chunks: Iterator[str], stop_condition: Optional[StopCondition] = None, on_complete: Optional[Callable] = None):
+        self._chunks = chunks
+        self.stop_condition = stop_condition
+        self.on_complete = on_complete
+        self.started = time.perf_counter()
+        self.time_to_first_token = None
+        self.total_time = None
+        self.stopped_early = False
+        self._parts = []
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._parts)
+
+    def _on_chunk(self, chunk: str) -> bool:
+        """Stores a chunk, returns True if the stream should stop."""
+        if chunk and self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.started
+        self._parts.append(chunk)
+        if self.stop_condition is not None and self.stop_condition(self.text):
+            self.stopped_early = True
+            return True
+        return False
+
+    def _complete(self):
+        self.total_time = time.perf_counter() - self.started
+        if self.on_complete is not None:
+            self.on_complete(self)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for chunk in self._chunks:
+                stop = self._on_chunk(chunk)
+                yield chunk
+                if stop:
+                    break
+        finally:
+            self._chunks.close()
+            self._complete()
+
+    def consume(self) -> str:
+        """Reads the stream to the end (or to the stop condition) and returns the full text."""
+        for _ in self:
+            pass
+        return self.text
+
+
+class AsyncGenerationStream(GenerationStream):
+    """Async counterpart of GenerationStream, iterate with `async for`."""
+
+    def __init__(self, chunks: AsyncIterator[str], stop_condition: Optional[StopCondition] = None, on_complete: Optional[Callable] = None):
+        super().__init__(chunks, stop_condition, on_complete)  # type: ignore
+
+    def __iter__(self):
+        raise TypeError("AsyncGenerationStream must be iterated with 'async for'")
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        try:
+            async for chunk in self._chunks:
+                stop = self._on_chunk(chunk)
+                yield chunk
+                if stop:
+                    break
+        finally:
+            await self._chunks.aclose()
+            self._complete()
+
+    async def consume(self) -> str:
+        async for _ in self:
+            pass
+        return self.text
@@ -0,0 +1,65 @@
+import asyncio
+import contextvars
+import threading
+import time
+from functools import lru_cache
+
+from instrumentation.metrics import queued
+
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_CONNECTIONS = 256
+DEFAULT_MAX_KEEPALIVE = 64
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def shared_transport(max_connections: int = DEFAULT_MAX_CONNECTIONS, max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE) -> 'httpx.AsyncHTTPTransport':
+    """
+    Connection pool shared by the async clients of all connectors with the same limits.
+
+    The pool binds its connections to the event loop that first uses them, so async
+    calls should go through `run_async` (or stay on one long-lived loop).
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+    return httpx.AsyncHTTPTransport(limits=limits)
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Returns the background event loop the connectors' async calls run on."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="connector-loop", daemon=True).start()
+        return _loop
+
+
+async def _run_in_context(coro, context):
+    return await asyncio.get_running_loop().create_task(coro, context=context)
+
+
+def run_async(coro, timeout=None):
+    """
+    Runs a coroutine on the background event loop from synchronous code and waits for the result.
+    The coroutine sees the caller's context variables (e.g. the current metrics stage).
+    """
+    context = contextvars.copy_context()
+    return asyncio.run_coroutine_threadsafe(_run_in_context(coro, context), get_event_loop()).result(timeout)
+
+
+async def gather_limited(coros, limit: int):
+    """Awaits the coroutines with at most `limit` of them in flight, results keep the input order."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _run(coro):
+        submitted = time.perf_counter()
+        async with semaphore:
+            with queued(time.perf_counter() - submitted):
+                return await coro
+
+    return await asyncio.gather(*(_run(coro) for coro in coros))
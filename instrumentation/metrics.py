@@ -0,0 +1,358 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from connector.responses import response_usage
+
+
+_stage = contextvars.ContextVar('stage', default=None)
+_method = contextvars.ContextVar('method', default=None)
+_queue_time = contextvars.ContextVar('queue_time', default=0.0)
+_retries = contextvars.ContextVar('retries', default=0)
+
+
+@dataclass
+class CallRecord:
+    """One connector call."""
+    model: str
+    provider: Optional[str]
+    stage: Optional[str]
+    method: Optional[str]
+    latency: float
+    queue_time: float = 0.0
+    time_to_first_token: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    retries: int = 0
+    error: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class StageRecord:
+    """One run of a pipeline stage over a batch."""
+    stage: str
+    method: Optional[str]
+    rows: int
+    wall_time: float
+    queue_time: float = 0.0
+    calls: int = 0
+    errors: int = 0
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def throughput(self) -> float:
+        return self.rows / self.wall_time if self.wall_time > 0 else 0.0
+
+
+class JsonLinesSink:
+    """Appends every record as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, kind: str, record: dict):
+        line = json.dumps({'kind': kind, **record}, default=str)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class MetricsRecorder:
+    """
+    Collects call, stage and counter metrics in memory and forwards them to its sinks.
+
+    Stage and method of a call are taken from the enclosing `stage(...)` block, so the
+    connectors do not need to know which part of the pipeline called them.
+    """
+
+    def __init__(self, sinks=None, prometheus_path: Optional[str] = None):
+        self.sinks = list(sinks or [])
+        self.prometheus_path = prometheus_path
+        self.calls: List[CallRecord] = []
+        self.stages: List[StageRecord] = []
+        self.counters: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, kind, record):
+        for sink in self.sinks:
+            sink.write(kind, record)
+
+    def record_call(self, record: CallRecord):
+        with self._lock:
+            self.calls.append(record)
+        self._emit('call', asdict(record))
+
+    def record_stage(self, record: StageRecord):
+        with self._lock:
+            self.stages.append(record)
+        self._emit('stage', {**asdict(record), 'throughput': record.throughput})
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Adds `value` to the counter `name` with the given labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    @contextmanager
+    def stage(self, name: str, method: Optional[str] = None, rows: int = 0):
+        """Times a pipeline stage and tags all connector calls made inside it."""
+        stage_token, method_token = _stage.set(name), _method.set(method)
+        first_call = len(self.calls)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            _stage.reset(stage_token)
+            _method.reset(method_token)
+            calls = [c for c in self.calls[first_call:] if c.stage == name and c.method == method]
+            self.record_stage(StageRecord(
+                stage=name,
+                method=method,
+                rows=rows,
+                wall_time=wall_time,
+                queue_time=sum(c.queue_time for c in calls),
+                calls=len(calls),
+                errors=sum(1 for c in calls if c.error),
+            ))
+
+    def mark(self) -> tuple:
+        """Position in the call and stage records, pass it to `summary(since=...)` to summarize one run."""
+        with self._lock:
+            return len(self.calls), len(self.stages)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.stages.clear()
+            self.counters.clear()
+
+    def summary(self, since: Optional[tuple] = None):
+        """
+        Per (stage, method, model) call statistics and per stage throughput as two DataFrames.
+        With `since` (from `mark()`), only the records made after the mark.
+        """
+        import pandas as pd
+
+        first_call, first_stage = since or (0, 0)
+        calls = pd.DataFrame([asdict(c) for c in self.calls[first_call:]])
+        if not calls.empty:
+            calls = calls.groupby(['stage', 'method', 'model'], dropna=False).agg(
+                calls=('latency', 'size'),
+                errors=('error', 'count'),
+                mean_latency=('latency', 'mean'),
+                p50_latency=('latency', 'median'),
+                p95_latency=('latency', lambda x: x.quantile(0.95)),
+                prompt_tokens=('prompt_tokens', 'sum'),
+                completion_tokens=('completion_tokens', 'sum'),
+                cached_tokens=('cached_tokens', 'sum'),
+                retries=('retries', 'sum'),
+            ).round(3)
+
+        stages = pd.DataFrame([{**asdict(s), 'throughput': s.throughput} for s in self.stages[first_stage:]])
+        if not stages.empty:
+            stages = stages.groupby(['stage', 'method'], dropna=False).agg(
+                runs=('rows', 'size'),
+                rows=('rows', 'sum'),
+                wall_time=('wall_time', 'sum'),
+                queue_time=('queue_time', 'sum'),
+                calls=('calls', 'sum'),
+                errors=('errors', 'sum'),
+            )
+            stages['throughput'] = stages['rows'] / stages['wall_time']
+            stages = stages.round(3)
+        return calls, stages
+
+    def prometheus_text(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        def labels(**kv):
+            items = [f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in kv.items() if v is not None]
+            return '{' + ','.join(items) + '}' if items else ''
+
+        calls: Dict[tuple, dict] = {}
+        for c in self.calls:
+            agg = calls.setdefault((c.model, c.stage, c.method), {'count': 0, 'errors': 0, 'latency': 0.0, 'prompt': 0, 'completion': 0, 'cached': 0})
+            agg['count'] += 1
+            agg['errors'] += 1 if c.error else 0
+            agg['latency'] += c.latency
+            agg['prompt'] += c.prompt_tokens or 0
+            agg['completion'] += c.completion_tokens or 0
+            agg['cached'] += c.cached_tokens or 0
+
+        lines = [
+            '# TYPE geo_llm_calls_total counter',
+            '# TYPE geo_llm_call_errors_total counter',
+            '# TYPE geo_llm_call_latency_seconds summary',
+            '# TYPE geo_llm_tokens_total counter',
+        ]
+        for (model, stage, method), agg in calls.items():
+            lbl = labels(model=model, stage=stage, method=method)
+            lines.append(f'geo_llm_calls_total{lbl} {agg["count"]}')
+            lines.append(f'geo_llm_call_errors_total{lbl} {agg["errors"]}')
+            lines.append(f'geo_llm_call_latency_seconds_sum{lbl} {agg["latency"]:.6f}')
+            lines.append(f'geo_llm_call_latency_seconds_count{lbl} {agg["count"]}')
+            for kind in ('prompt', 'completion', 'cached'):
+                lines.append(f'geo_llm_tokens_total{labels(model=model, stage=stage, method=method, kind=kind)} {agg[kind]}')
+
+        lines += ['# TYPE geo_stage_rows_total counter', '# TYPE geo_stage_seconds_total counter', '# TYPE geo_stage_queue_seconds_total counter']
+        stages: Dict[tuple, list] = {}
+        for s in self.stages:
+            agg = stages.setdefault((s.stage, s.method), [0, 0.0, 0.0])
+            agg[0] += s.rows
+            agg[1] += s.wall_time
+            agg[2] += s.queue_time
+        for (stage, method), (rows, wall, queue) in stages.items():
+            lbl = labels(stage=stage, method=method)
+            lines.append(f'geo_stage_rows_total{lbl} {rows}')
+            lines.append(f'geo_stage_seconds_total{lbl} {wall:.6f}')
+            lines.append(f'geo_stage_queue_seconds_total{lbl} {queue:.6f}')
+
+        for (name, label_items), value in self.counters.items():
+            lines.append(f'geo_{name}_total{labels(**dict(label_items))} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+
+
+_recorder = MetricsRecorder()
+
+
+def get_recorder() -> MetricsRecorder:
+    return _recorder
+
+
+def configure_metrics(jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None) -> MetricsRecorder:
+    """
+    Sets the sinks of the default recorder. Paths default to the GEO_METRICS_JSONL and
+    GEO_METRICS_PROM environment variables.
+    """
+    jsonl_path = jsonl_path or os.environ.get('GEO_METRICS_JSONL')
+    _recorder.prometheus_path = prometheus_path or os.environ.get('GEO_METRICS_PROM')
+    _recorder.sinks = [JsonLinesSink(jsonl_path)] if jsonl_path else []
+    return _recorder
+
+
+configure_metrics()
+
+
+@contextmanager
+def queued(queue_time: float):
+    """Marks the connector calls made inside the block as having waited `queue_time` seconds for a slot."""
+    token = _queue_time.set(queue_time)
+    try:
+        yield
+    finally:
+        _queue_time.reset(token)
+
+
+@contextmanager
+def retrying(attempt: int):
+    """Marks the connector calls made inside the block as retry number `attempt` of a request."""
+    token = _retries.set(attempt)
+    try:
+        yield
+    finally:
+        _retries.reset(token)
+
+
+def _record(connector, start, response=None, error=None, time_to_first_token=None):
+    usage = response_usage(response) if response is not None else {}
+    _recorder.record_call(CallRecord(
+        model=connector.model_name,
+        provider=getattr(connector, 'provider', None),
+        stage=_stage.get(),
+        method=_method.get(),
+        latency=time.perf_counter() - start,
+        queue_time=_queue_time.get(),
+        time_to_first_token=time_to_first_token,
+        prompt_tokens=usage.get('prompt_tokens'),
+        completion_tokens=usage.get('completion_tokens'),
+        cached_tokens=usage.get('cached_tokens'),
+        retries=_retries.get(),
+        error=type(error).__name__ if error is not None else None,
+    ))
+
+
+def instrumented(fn):
+    """Records latency, token usage and errors of a connector `call` or `acall` method."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                response = await fn(self, *args, **kwargs)
+            except Exception as e:
+                _record(self, start, error=e)
+                raise
+            _record(self, start, response=response)
+            return response
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = fn(self, *args, **kwargs)
+        except Exception as e:
+            _record(self, start, error=e)
+            raise
+        _record(self, start, response=response)
+        return response
+    return wrapper
+
+
+def record_stream(connector, stream):
+    """Records a finished GenerationStream of `connector`."""
+    _recorder.record_call(CallRecord(
+        model=connector.model_name,
+        provider=getattr(connector, 'provider', None),
+        stage=_stage.get(),
+        method=_method.get(),
+        latency=stream.total_time or 0.0,
+        queue_time=_queue_time.get(),
+        time_to_first_token=stream.time_to_first_token,
+    ))
+
+
+def print_metrics_summary(recorder: Optional[MetricsRecorder] = None, method_name="Run", width=72, since: Optional[tuple] = None):
+    """
+    Pretty-prints the call and stage summary of a recorder (of the records after `since`, see
+    `MetricsRecorder.mark`), and writes the Prometheus file with the process totals if configured.
+    """
+    recorder = recorder or _recorder
+    title = f"[{method_name}] Metrics Summary"
+    width = max(width, len(title) + 4)
+    sep = "=" * width
+
+    calls, stages = recorder.summary(since)
+    print(sep)
+    print(title.center(width))
+    print(sep)
+    if not stages.empty:
+        print(stages.to_string())
+        print("-" * width)
+    if not calls.empty:
+        print(calls.to_string())
+    if stages.empty and calls.empty:
+        print("no metrics recorded")
+    print(sep)
+
+    if recorder.prometheus_path:
+        recorder.write_prometheus(recorder.prometheus_path)
@@ -0,0 +1,168 @@
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+
+@dataclass
+class StageProfile:
+    """Resources used by one run of a profiled stage."""
+    stage: str
+    wall_time: float
+    cpu_time: float
+    peak_memory: Optional[int] = None
+    profile_path: Optional[str] = None
+
+
+class _Config:
+    enabled = False
+    memory = True
+    cprofile = False
+    profile_dir = './profiles'
+
+
+_config = _Config()
+_stack: List[dict] = []
+_counts: dict = {}
+profiles: List[StageProfile] = []
+
+
+def configure_profiling(enabled: bool = True, memory: bool = True, cprofile: bool = False, profile_dir: str = './profiles'):
+    """
+    Switches the stage profiling hooks on or off.
+
+    Args:
+        enabled (bool): Record wall-clock and CPU time per stage.
+        memory (bool): Also record the peak traced memory per stage (tracemalloc).
+        cprofile (bool): Also dump a cProfile of every stage run to `profile_dir`.
+        profile_dir (str): Directory of the cProfile dumps and the stages.jsonl log.
+    """
+    _config.enabled = enabled
+    _config.memory = memory
+    _config.cprofile = cprofile
+    _config.profile_dir = profile_dir
+    if enabled and memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if (not enabled or not memory) and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def configure_from_env():
+    """
+    Reads GEO_PROFILE: unset/'0' disables profiling, '1' records time and memory,
+    'cprofile' also writes cProfile dumps. GEO_PROFILE_DIR sets the output directory.
+    """
+    value = os.environ.get('GEO_PROFILE', '0').strip().lower()
+    if value in ('', '0', 'off', 'false'):
+        return
+    configure_profiling(enabled=True, cprofile=value == 'cprofile', profile_dir=os.environ.get('GEO_PROFILE_DIR', './profiles'))
+
+
+def is_enabled() -> bool:
+    return _config.enabled
+
+
+@contextmanager
+def profile_stage(name: str):
+    """Profiles the enclosed block as stage `name`; does nothing when profiling is off."""
+    if not _config.enabled:
+        yield
+        return
+
+    frame = {'peak': 0}
+    memory = _config.memory and tracemalloc.is_tracing()
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if _stack:
+            _stack[-1]['peak'] = max(_stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['start_memory'] = current
+
+    # Only one cProfile can be active, nested stages are covered by the outer dump
+    profiler = None
+    if _config.cprofile and not any(f.get('profiler') for f in _stack):
+        profiler = cProfile.Profile()
+        frame['profiler'] = profiler
+
+    _stack.append(frame)
+    wall, cpu = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        _stack.pop()
+
+        peak_memory = None
+        if memory:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            peak_memory = peak - frame['start_memory']
+            if _stack:
+                _stack[-1]['peak'] = max(_stack[-1]['peak'], peak)
+
+        profile_path = None
+        if profiler is not None:
+            os.makedirs(_config.profile_dir, exist_ok=True)
+            _counts[name] = _counts.get(name, 0) + 1
+            profile_path = os.path.join(_config.profile_dir, f'{name}-{_counts[name]}.prof')
+            profiler.dump_stats(profile_path)
+
+        _record(StageProfile(name, wall, cpu, peak_memory, profile_path))
+
+
+def profiled(name: Optional[str] = None):
+    """Decorator form of `profile_stage`; when profiling is off the function is called directly."""
+    def decorator(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _config.enabled:
+                return fn(*args, **kwargs)
+            with profile_stage(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record(profile: StageProfile):
+    profiles.append(profile)
+    os.makedirs(_config.profile_dir, exist_ok=True)
+    with open(os.path.join(_config.profile_dir, 'stages.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(asdict(profile)) + '\n')
+
+
+def print_profile_summary(title="Profile", width=72):
+    """Pretty-prints time and memory per profiled stage (nothing when profiling is off)."""
+    if not _config.enabled or not profiles:
+        return
+    title = f"[{title}] Stage Profile"
+    width = max(width, len(title) + 4)
+    sep = "=" * width
+
+    totals = {}
+    for p in profiles:
+        t = totals.setdefault(p.stage, [0, 0.0, 0.0, 0])
+        t[0] += 1
+        t[1] += p.wall_time
+        t[2] += p.cpu_time
+        t[3] = max(t[3], p.peak_memory or 0)
+
+    print(sep)
+    print(title.center(width))
+    print(sep)
+    print(f"{'stage':<28} {'runs':>5} {'wall s':>9} {'cpu s':>9} {'peak MiB':>10}")
+    for stage, (runs, wall, cpu, peak) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+        print(f"{stage:<28} {runs:>5d} {wall:>9.3f} {cpu:>9.3f} {peak / 2**20:>10.2f}")
+    print(sep)
+
+
+configure_from_env()
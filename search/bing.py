@@ -0,0 +1,18 @@
+from search.engine import SearchEngine
+
+
+class BingSearchEngine(SearchEngine):
+    """Bing results through SerpApi."""
+
+    name = "bing"
+
+    def build_params(self, query, locale, num):
+        return {
+            "engine": "bing",
+            "q": query,
+            "location": locale.location,
+            "cc": locale.country.upper(),
+            "mkt": f"{locale.language}-{locale.country.upper()}",
+            "count": str(num),
+            "api_key": self.api_key
+        }
@@ -0,0 +1,137 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from cachetools import TTLCache
+
+
+class SearchResult(NamedTuple):
+    """One organic result of a SERP."""
+    position: int
+    title: str
+    url: str
+
+
+class Locale(NamedTuple):
+    """Location settings sent along with every SERP request."""
+    location: str = "Heilbronn, Baden-Wurttemberg, Germany"
+    google_domain: str = "google.de"
+    country: str = "de"
+    language: str = "en"
+
+
+# A backend takes the SerpApi request parameters and returns the decoded JSON response.
+Backend = Callable[[dict], dict]
+
+# SerpApi reports an empty SERP as an error, e.g. "Google hasn't returned any results for this query."
+NO_RESULTS = "hasn't returned any results"
+
+
+class SearchError(RuntimeError):
+    """Raised by `search_many` when queries failed; holds the results of the others."""
+
+    def __init__(self, results: Dict[str, List['SearchResult']], errors: Dict[str, Exception]):
+        super().__init__(f"{len(errors)} of {len(results) + len(errors)} searches failed: "
+                         + "; ".join(f"'{query}': {error}" for query, error in errors.items()))
+        self.results = results
+        self.errors = errors
+
+
+def serpapi_backend(params: dict) -> dict:
+    """Default HTTP backend, sends the request through the SerpApi client."""
+    from serpapi import GoogleSearch
+
+    # The engine is taken from params, GoogleSearch only sets it as a default.
+    return GoogleSearch(params).get_dict()
+
+
+class SearchEngine(ABC):
+    """Abstract base class (interface) for search engines.
+
+    Results are cached for `cache_ttl` seconds, keyed by (engine, query, locale, num).
+    `backend` can be replaced by a local stub to run without network access.
+    """
+
+    name = "engine"
+
+    def __init__(self, api_key: Optional[str] = None, locale: Locale = Locale(), backend: Backend = serpapi_backend,
+                 cache_ttl: float = 24 * 3600, cache_size: int = 10_000, max_workers: int = 8):
+        self.api_key = api_key
+        self.locale = locale
+        self.backend = backend
+        self.max_workers = max_workers
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._lock = Lock()
+
+    @abstractmethod
+    def build_params(self, query: str, locale: Locale, num: int) -> dict:
+        """Build the request parameters for a single query"""
+        pass
+
+    def parse_results(self, results: dict, num: int) -> List[SearchResult]:
+        """Turn the raw response into ranked results."""
+        ranked = []
+        for i, result in enumerate(results.get('organic_results', [])[:num], start=1):
+            ranked.append(SearchResult(result.get('position', i), result.get('title', ''), result.get('link')))
+        return ranked
+
+    def search(self, query: str, num: int = 5, locale: Optional[Locale] = None) -> List[SearchResult]:
+        """
+        Searches a single query, answering from the cache when possible.
+
+        Args:
+            query (str): Search query string.
+            num (int): Number of organic results to return.
+            locale (Optional[Locale]): Overrides the engine locale for this query.
+
+        Returns:
+            List[SearchResult]: [(position, title, url), ...]
+        """
+        locale = locale or self.locale
+        key = (self.name, query, locale, num)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        results = self.backend(self.build_params(query, locale, num))
+        if 'error' in results and NO_RESULTS not in results['error']:
+            raise RuntimeError(f"{self.name} search failed for '{query}': {results['error']}")
+        ranked = self.parse_results(results, num)
+
+        with self._lock:
+            self._cache[key] = tuple(ranked)
+        return ranked
+
+    def search_many(self, queries: Sequence[str], num: int = 5, locale: Optional[Locale] = None,
+                    return_exceptions: bool = False) -> Dict[str, List[SearchResult]]:
+        """
+        Searches several queries concurrently. Duplicate queries are only fetched once.
+
+        A failed query does not stop the others. With `return_exceptions`, its exception is
+        returned in place of its results; otherwise a SearchError holding the results of the
+        successful queries is raised once all are done.
+
+        Returns:
+            Dict[str, List[SearchResult]]: Results per query, in the order of `queries`.
+        """
+        unique = list(dict.fromkeys(queries))
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(unique)))) as pool:
+            futures = {q: pool.submit(self.search, q, num=num, locale=locale) for q in unique}
+        results, errors = {}, {}
+        for query, future in futures.items():
+            error = future.exception()
+            if error is None:
+                results[query] = future.result()
+            elif return_exceptions:
+                results[query] = error
+            else:
+                errors[query] = error
+        if errors:
+            raise SearchError(results, errors)
+        return results
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
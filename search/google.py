@@ -1,37 +1,51 @@
-from serpapi import GoogleSearch
-import configparser
+from functools import lru_cache
+from search.engine import Locale, SearchEngine
 
-def get_ranked_urls(query, api_key):
+
+class GoogleSearchEngine(SearchEngine):
+    """Google results through SerpApi."""
+
+    name = "google"
+
+    def build_params(self, query, locale, num):
+        return {
+            "engine": "google",
+            "q": query,
+            "location": locale.location,
+            "google_domain": locale.google_domain,
+            "gl": locale.country,
+            "hl": locale.language,
+            "num": str(num),
+            "api_key": self.api_key
+        }
+
+
+@lru_cache(maxsize=None)
+def _shared_engine(api_key):
+    return GoogleSearchEngine(api_key)
+
+
+def get_ranked_urls(query, api_key, num=5, locale=Locale(), engine=None):
     """
     Performs Google search using SerpApi and returns ranked URLs.
 
     Args:
         query (str): Search query string.
         api_key (str): SerpApi API key.
+        num (int): Number of results to return.
+        locale (Locale): Location settings of the search.
+        engine (SearchEngine, optional): Engine to use, defaults to a shared GoogleSearchEngine per api key.
 
     Returns:
-        list of tuples: [(position, title, url), ...]
+        list of str: [url, ...] ordered by rank.
     """
-    params = {
-        "engine": "google",
-        "q": query,
-        "location": "Heilbronn, Baden-Wurttemberg, Germany",
-        "google_domain": "google.de",
-        "gl": "de",
-        "hl": "en",
-        "num": "5",
-        "api_key": api_key
-    }
-
-    search = GoogleSearch(params)
-    results = search.get_dict()
-
-    return [ result.get('link') for result in results.get('organic_results', [])]
+    engine = engine or _shared_engine(api_key)
+    return [result.url for result in engine.search(query, num=num, locale=locale)]
 
 # # Example usage:
 # config = configparser.ConfigParser()
 # config.read('config.ini')
 # api_key = config['API_KEYS']['google_api_key']
-# urls = get_ranked_urls("Corporate Lawyers in Heilbronn", api_key)
-# for rank, title, url in urls:
+# engine = GoogleSearchEngine(api_key)
+# for rank, title, url in engine.search("Corporate Lawyers in Heilbronn"):
 #     print(f"{rank}: {title} -> {url}")
@@ -0,0 +1,33 @@
+import json
+from typing import Dict, List, Optional
+
+
+class StubBackend:
+    """
+    Offline replacement for the SerpApi backend.
+
+    Answers from a mapping of query -> list of urls (the format of the search
+    checkpoints), and records every request it receives in `calls`.
+    """
+
+    def __init__(self, results: Optional[Dict[str, List[str]]] = None, default: Optional[List[str]] = None):
+        self.results = results or {}
+        self.default = default or []
+        self.calls = []
+
+    @classmethod
+    def from_checkpoint(cls, query: str, filepath: str):
+        """Serves the urls stored in a `*_search.json` checkpoint for `query`."""
+        with open(filepath, 'r') as f:
+            return cls({query: json.load(f)})
+
+    def __call__(self, params: dict) -> dict:
+        self.calls.append(params)
+        urls = self.results.get(params["q"], self.default)
+        num = int(params.get("num") or params.get("count") or len(urls))
+        return {
+            "organic_results": [
+                {"position": i, "title": f"Result {i} for {params['q']}", "link": url}
+                for i, url in enumerate(urls[:num], start=1)
+            ]
+        }